@@ -0,0 +1,137 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+"""
+Local stand-in picon server serving a synthetic picon set from memory
+The server provides picons/picon_info.txt with one picon set and picons/bench/ with the picons
+and zz_picon_list.txt, with a configurable response latency, per connection bandwidth and error rate
+"""
+
+
+import time
+import random
+import hashlib
+import threading
+import functools
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+set_dir = "picons/bench/"
+set_signature = "19.2E | bench - Benchmark | 220x132 | 8 bit | bench"
+
+
+def getSizes(count, size_dist, mean_size, seed):
+    """Return count picon sizes of the distribution fixed, uniform (0.5 to 1.5 * mean) or lognormal"""
+    rng = random.Random(seed)
+    if size_dist == "fixed":
+        return [mean_size] * count
+    if size_dist == "uniform":
+        return [int(rng.uniform(0.5, 1.5) * mean_size) for _i in range(count)]
+    # lognormal with median mean_size, a few picons are several times larger
+    return [max(256, int(rng.lognormvariate(0, 0.6) * mean_size)) for _i in range(count)]
+
+
+class PiconSet():
+    """Synthetic picon set, the picon contents are random and incompressible like real PNGs"""
+
+    def __init__(self, count=1000, size_dist="lognormal", mean_size=16 * 1024, seed=1):
+        rng = random.Random(seed)
+        self.files = {}
+        self.last_modified = formatdate(time.time() - 3600, usegmt=True)
+        picons = []
+        for i, size in enumerate(getSizes(count, size_dist, mean_size, seed)):
+            picon = "1_0_19_%X_%X_1_C00000_0_0_0.png" % (1000 + i, 1 + i % 50)
+            self.files[set_dir + picon] = rng.randbytes(size)
+            picons.append("%s;%d" % (picon, size))
+        self.files[set_dir + "zz_picon_list.txt"] = ("\n".join(picons) + "\n").encode()
+        self.files["picons/picon_info.txt"] = b"picons/bench;preview.png;2026-01-01;Benchmark;19.2E;bench;8 bit;220 x 132;bench\n"
+        self.etags = {path: '"%s"' % hashlib.sha1(data).hexdigest()[:16] for path, data in self.files.items()}
+        self.picon_count = count
+        self.picon_bytes = sum(len(data) for path, data in self.files.items() if path.endswith(".png"))
+
+
+class PiconRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args, picon_set=None, latency=0.0, bandwidth=0, error_rate=0.0, **kwargs):
+        self.picon_set = picon_set
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
+
+    def log_message(self, *_args):
+        return
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def sendStatus(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def respond(self, send_body):
+        if self.latency:
+            time.sleep(self.latency)
+        path = self.path.split("?")[0].lstrip("/")
+        data = self.picon_set.files.get(path)
+        if data is None:
+            self.sendStatus(404)
+            return
+        if self.error_rate and random.random() < self.error_rate:
+            self.sendStatus(503)
+            return
+        etag = self.picon_set.etags[path]
+        if self.headers.get("If-None-Match") == etag:
+            self.sendStatus(304)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.picon_set.last_modified)
+        self.end_headers()
+        if send_body:
+            self.sendBody(data)
+
+    def sendBody(self, data):
+        if not self.bandwidth:
+            self.wfile.write(data)
+            return
+        # The bandwidth is limited per connection, in slices of 1/20 s
+        chunk_size = max(1, self.bandwidth // 20)
+        for offset in range(0, len(data), chunk_size):
+            start = time.monotonic()
+            self.wfile.write(data[offset:offset + chunk_size])
+            delay = chunk_size / self.bandwidth - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+
+class PiconServer():
+    """Runs the stand-in picon server on a local port in a background thread"""
+
+    def __init__(self, picon_set, latency=0.0, bandwidth=0, error_rate=0.0, port=0):
+        handler = functools.partial(PiconRequestHandler, picon_set=picon_set, latency=latency, bandwidth=bandwidth, error_rate=error_rate)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def getUrl(self):
+        return "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
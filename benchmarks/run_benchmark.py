@@ -0,0 +1,167 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+"""
+Benchmark of the picon download engine against a local stand-in picon server
+Each engine mode, a thread per download or a bounded pool of worker threads, and number of
+parallel downloads is run in its own process with the GUI free download engine of the plugin,
+so no Enigma2 is needed, and files/s, MB/s, p95 latency and peak RSS are reported. A warm run repeats the download into the same picon directory, where
+every picon is revalidated with a conditional request.
+
+python benchmarks/run_benchmark.py --count 2000 --latency-ms 20 --engines threads,pool --max-downloads 4,8 --warm
+"""
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from urllib.parse import urljoin
+
+from picon_server import PiconSet, PiconServer, set_dir
+
+
+src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def runChild(config):
+    """Download the picon set once with the engine settings of config and print the result as json"""
+    import logging  # pylint: disable=import-outside-toplevel
+    sys.path.insert(0, config["package_root"])
+    from PiconCockpit.Debug import setLogLevel  # pylint: disable=import-outside-toplevel
+    from PiconCockpit.sync import CompletionLoop, fetchFile  # pylint: disable=import-outside-toplevel
+    from PiconCockpit.WebRequestsAsync import WebRequestsAsync  # pylint: disable=import-outside-toplevel
+    from PiconCockpit.PiconCatalog import picon_list_file  # pylint: disable=import-outside-toplevel
+    from PiconCockpit.PiconSync import PiconList  # pylint: disable=import-outside-toplevel
+    from PiconCockpit.PiconDownload import PiconDownload, DownloadOptions  # pylint: disable=import-outside-toplevel
+
+    # transient server errors are part of the benchmark, they are not logged
+    setLogLevel(logging.CRITICAL)
+    loop = CompletionLoop()
+    web_client = WebRequestsAsync(engine=config["engine"], completion_queue=loop)
+    set_url = urljoin(config["url"], set_dir)
+    list_path = os.path.join(config["picon_dir"], picon_list_file)
+    _downloader, error = fetchFile(web_client, loop, urljoin(set_url, picon_list_file), list_path)
+    web_client.close()
+    if error is not None:
+        print(json.dumps({"error": str(error)}))
+        return 1
+
+    options = DownloadOptions(max_downloads=config["max_downloads"], engine=config["engine"])
+    download = PiconDownload(set_url, PiconList(list_path), config["picon_dir"], options, loop)
+    done = []
+    download.finished_callback = lambda: done.append(True)
+    start_time = time.monotonic()
+    download.start()
+    loop.run(lambda: done)
+    elapsed = time.monotonic() - start_time
+    download.close()
+
+    stats = download.getStats()
+    files = download.downloaded_files + download.unchanged_files
+    print(json.dumps({
+        "files": files,
+        "failed": download.failed_files + download.skipped_files,
+        "retries": download.retries,
+        "bytes": stats["bytes"],
+        "elapsed": elapsed,
+        "files_per_s": files / elapsed if elapsed else 0,
+        "mb_per_s": stats["bytes"] / elapsed / 1024 / 1024 if elapsed else 0,
+        "latency_p95_ms": stats["latency_p95"] * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }))
+    return 0
+
+
+def runCase(config):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+        stdout=subprocess.PIPE, check=False, text=True
+    )
+    lines = process.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {"error": "no result, exit code %s" % process.returncode}
+
+
+def formatRow(values, widths):
+    return "  ".join(str(value).rjust(width) for value, width in zip(values, widths))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the picon download engine against a local stand-in picon server")
+    parser.add_argument("--count", type=int, default=1000, help="picons in the set (default: %(default)s)")
+    parser.add_argument("--size-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal", help="picon size distribution (default: %(default)s)")
+    parser.add_argument("--mean-size", type=int, default=16 * 1024, help="typical picon size in bytes (default: %(default)s)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="server latency per request (default: %(default)s)")
+    parser.add_argument("--bandwidth-kbps", type=int, default=0, help="server bandwidth per connection in KB/s, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503 (default: %(default)s)")
+    parser.add_argument("--engines", default="threads,pool", help="comma separated engine modes (default: %(default)s)")
+    parser.add_argument("--max-downloads", default="4,8", help="comma separated numbers of parallel downloads (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the best run is reported")
+    parser.add_argument("--warm", action="store_true", help="also run with all picons already downloaded")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return runChild(json.loads(args.child))
+
+    picon_set = PiconSet(args.count, args.size_dist, args.mean_size, args.seed)
+    server = PiconServer(picon_set, args.latency_ms / 1000.0, args.bandwidth_kbps * 1024, args.error_rate).start()
+    print("picons: %d, %.1f MB, latency: %g ms, bandwidth: %s, error rate: %g" % (
+        picon_set.picon_count, picon_set.picon_bytes / 1024.0 / 1024.0, args.latency_ms,
+        "%d KB/s" % args.bandwidth_kbps if args.bandwidth_kbps else "unlimited", args.error_rate))
+
+    # The plugin sources are imported as the package PiconCockpit, like on the receiver
+    work_dir = tempfile.mkdtemp(prefix="piconcockpit_bench_")
+    os.symlink(src_dir, os.path.join(work_dir, "PiconCockpit"))
+    header = ["engine", "downloads", "run", "files", "failed", "retries", "files/s", "MB/s", "p95 ms", "RSS MB"]
+    widths = [8, 9, 4, 6, 6, 7, 8, 7, 7, 7]
+    print(formatRow(header, widths))
+    results = []
+    try:
+        for engine in args.engines.split(","):
+            for max_downloads in [int(value) for value in args.max_downloads.split(",")]:
+                for run in ["cold", "warm"] if args.warm else ["cold"]:
+                    best = None
+                    for _i in range(args.repeat):
+                        picon_dir = os.path.join(work_dir, "picons_%s_%d" % (engine, max_downloads))
+                        if run == "cold":
+                            shutil.rmtree(picon_dir, ignore_errors=True)
+                        os.makedirs(picon_dir, exist_ok=True)
+                        result = runCase({"package_root": work_dir, "url": server.getUrl(), "engine": engine, "max_downloads": max_downloads, "picon_dir": picon_dir})
+                        if "error" in result:
+                            best = result
+                            break
+                        if best is None or result["files_per_s"] > best["files_per_s"]:
+                            best = result
+                    best.update({"engine": engine, "max_downloads": max_downloads, "run": run})
+                    results.append(best)
+                    if "error" in best:
+                        print(formatRow([engine, max_downloads, run], widths[:3]) + "  error: " + best["error"])
+                        continue
+                    print(formatRow([
+                        engine, max_downloads, run, best["files"], best["failed"], best["retries"],
+                        "%.1f" % best["files_per_s"], "%.2f" % best["mb_per_s"], "%.0f" % best["latency_p95_ms"], "%.1f" % best["peak_rss_mb"]
+                    ], widths), flush=True)
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key not in ("json", "child")}, "results": results}, f, indent=2)
+    return 1 if any("error" in result or result["failed"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
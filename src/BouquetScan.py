@@ -0,0 +1,88 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import re
+from .Debug import logger
+from .FileUtils import iterFileLines
+from .PiconSync import getPiconName
+
+
+bouquet_dir = "/etc/enigma2"
+root_bouquets = ["bouquets.tv", "bouquets.radio"]
+marker_flag = 64
+bouquet_re = re.compile(r'FROM BOUQUET "([^"]+)"')
+
+
+def readBouquet(path):
+    """Return the name and the (service_ref, description) entries of a bouquet file"""
+    name = ""
+    entries = []
+    try:
+        for line in iterFileLines(path):
+            if line.startswith("#NAME "):
+                name = line[6:].strip()
+            elif line.startswith("#SERVICE "):
+                entries.append([line[9:].strip(), ""])
+            elif line.startswith("#DESCRIPTION ") and entries:
+                entries[-1][1] = line[13:].strip()
+    except (OSError, UnicodeDecodeError) as e:
+        logger.error("path: %s, exception: %s", path, e)
+    return name, entries
+
+
+def isMarker(service_ref):
+    fields = service_ref.split(":")
+    return len(fields) > 1 and fields[1].isdigit() and int(fields[1]) & marker_flag
+
+
+def listBouquetServices(directory=bouquet_dir):
+    """
+    List the services of the user bouquets from the bouquet files in directory, without Enigma2
+    Returns list of tuples: (service_reference_string, service_name) in bouquet order, without duplicates
+    """
+    services = []
+    service_refs_seen = set()
+    bouquets_seen = set()
+
+    def scanBouquet(filename):
+        if filename in bouquets_seen:
+            return
+        bouquets_seen.add(filename)
+        name, entries = readBouquet(os.path.join(directory, filename))
+        if "Last Scanned" in name:
+            logger.debug("Skipping 'Last Scanned' bouquet: %s", filename)
+            return
+        for service_ref, service_name in entries:
+            match = bouquet_re.search(service_ref)
+            if match:
+                # a bouquet of the root bouquet or a sub bouquet
+                scanBouquet(match.group(1))
+            elif not isMarker(service_ref):
+                fields = service_ref.split(":")
+                if len(fields) > 10:
+                    # the picon name is taken from the reference part, without the url and name of stream services
+                    service_ref = ":".join(fields[:10]) + ":"
+                if service_ref not in service_refs_seen:
+                    service_refs_seen.add(service_ref)
+                    services.append((service_ref, service_name))
+
+    for filename in root_bouquets:
+        scanBouquet(filename)
+    logger.debug("bouquets: %s, services: %s", len(bouquets_seen), len(services))
+    return services
+
+
+def getBouquetPicons(services):
+    """Return the picon names of the DVB services of a service list"""
+    picons = []
+    for service in services:
+        try:
+            picon = getPiconName(service[0])
+            if picon.startswith("1_"):
+                picons.append(picon)
+        except Exception as e:
+            logger.error("Error processing service %s: %s", service, e)
+    return picons
@@ -0,0 +1,50 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+from collections import deque
+from enigma import eTimer
+from .Debug import logger
+
+
+class CompletionQueue():
+    """
+    Thread-safe queue of completion callbacks that are run on the Enigma2 main loop
+    Worker threads put callbacks, an eTimer runs the callbacks queued so far in one wakeup
+    The timer polls every min_interval ms while completions arrive and backs off
+    to max_interval ms when the queue stays empty
+    """
+
+    def __init__(self, min_interval=10, max_interval=100):
+        self.queue = deque()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = max_interval
+        self.timer = eTimer()
+        self.timer.callback.append(self.drain)
+        self.timer.start(self.interval, False)
+
+    def put(self, function, *args):
+        # deque.append is atomic, no lock needed between worker threads and the main loop
+        self.queue.append((function, args))
+
+    def drain(self):
+        interval = min(self.interval * 2, self.max_interval) if not self.queue else self.min_interval
+        # Only the callbacks queued before this wakeup are run, callbacks they queue wait for the next one
+        for _i in range(len(self.queue)):
+            function, args = self.queue.popleft()
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error("function: %s, exception: %s", function, e)
+        if interval != self.interval and self.timer.isActive():
+            self.interval = interval
+            self.timer.start(interval, False)
+
+    def close(self):
+        logger.debug("pending: %s", len(self.queue))
+        self.timer.stop()
+        if self.drain in self.timer.callback:
+            self.timer.callback.remove(self.drain)
+        self.queue.clear()
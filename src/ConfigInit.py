@@ -3,12 +3,14 @@
 # License: GNU General Public License v3.0 (see LICENSE file for details)
 
 
-from Components.config import config, ConfigText, ConfigYesNo, ConfigSelection, ConfigSubsection, ConfigNothing, NoSave, configfile
+from Components.config import config, ConfigText, ConfigInteger, ConfigYesNo, ConfigSelection, ConfigSubsection, ConfigNothing, NoSave, configfile
 from .Debug import logger, log_levels, initLogging
+from .__init__ import _
+from .PiconCatalog import default_server
 
 
 server_choices = [
-    ("http://picons.vuplus-support.org/", "vuplus-support.org"),
+    (default_server, "vuplus-support.org"),
 ]
 
 
@@ -22,14 +24,47 @@ class ConfigInit():
         # Server and directory settings
         config.plugins.piconcockpit.picon_server = ConfigSelection(
             default=server_choices[0][0], choices=server_choices)
+        config.plugins.piconcockpit.mirrors = ConfigText(
+            default="", fixed_size=False, visible_width=50)
         config.plugins.piconcockpit.picon_directory = ConfigText(
             default="/usr/share/enigma2/picon", fixed_size=False, visible_width=50)
 
         # Download behavior settings
         config.plugins.piconcockpit.all_picons = ConfigYesNo(default=False)
         config.plugins.piconcockpit.delete_before_download = ConfigYesNo(default=False)
+        config.plugins.piconcockpit.sync_mode = ConfigSelection(
+            default="full", choices=[("full", _("all picons")), ("changed", _("only missing / changed picons")), ("manifest", _("only picons changed in the set manifest"))])
+        config.plugins.piconcockpit.delete_removed = ConfigYesNo(default=False)
+        config.plugins.piconcockpit.use_archive = ConfigYesNo(default=False)
+        config.plugins.piconcockpit.dedup_picons = ConfigYesNo(default=False)
+        config.plugins.piconcockpit.spool_downloads = ConfigYesNo(default=False)
+        config.plugins.piconcockpit.spool_size = ConfigSelection(
+            default="8", choices=[(str(x), str(x) + " MB") for x in (2, 4, 8, 16, 32)])
+        config.plugins.piconcockpit.cache_directory = ConfigText(
+            default="/usr/share/enigma2/piconcockpit_cache", fixed_size=False, visible_width=50)
+        config.plugins.piconcockpit.cache_size = ConfigSelection(
+            default="0", choices=[("0", _("off"))] + [(str(x), str(x) + " MB") for x in (16, 32, 64, 128, 256)])
+        config.plugins.piconcockpit.max_downloads = ConfigSelection(
+            default="4", choices=["1", "2", "4", "8", "12", "16"])
+        config.plugins.piconcockpit.bandwidth_limit = ConfigSelection(
+            default="0", choices=[("0", _("unlimited"))] + [(str(x), str(x) + " KB/s") for x in (64, 128, 256, 512, 1024, 2048, 4096)])
+        config.plugins.piconcockpit.unlimited_in_standby = ConfigYesNo(default=True)
+        config.plugins.piconcockpit.download_engine = ConfigSelection(
+            default="threads", choices=[("threads", _("thread per download")), ("pool", _("worker pool"))])
+        # Scheduled background sync of the last picon set
+        config.plugins.piconcockpit.schedule_mode = ConfigSelection(
+            default="off", choices=[("off", _("off")), ("daily", _("daily")), ("standby", _("in standby")), ("both", _("daily and in standby"))])
+        config.plugins.piconcockpit.schedule_hour = ConfigSelection(
+            default="4", choices=[(str(x), "%02d:00" % x) for x in range(24)])
+        config.plugins.piconcockpit.schedule_max_downloads = ConfigSelection(
+            default="2", choices=["1", "2", "4"])
+        config.plugins.piconcockpit.schedule_bandwidth_limit = ConfigSelection(
+            default="256", choices=[("0", _("unlimited"))] + [(str(x), str(x) + " KB/s") for x in (64, 128, 256, 512, 1024)])
+        config.plugins.piconcockpit.last_scheduled_sync = ConfigInteger(default=0, limits=(0, 2147483647))
         config.plugins.piconcockpit.last_picon_set = ConfigText(
             default="", fixed_size=False, visible_width=20)
+        # average throughput of the last download in KB/s, for the duration estimate
+        config.plugins.piconcockpit.last_throughput = ConfigInteger(default=0, limits=(0, 9999999))
 
         # Debug settings
         config.plugins.piconcockpit.debug_log_level = ConfigSelection(
@@ -19,10 +19,45 @@ class ConfigScreenInit():
              None, 0, [], _("Select the directory the picons are stored in.")),
             (_("Picon server"), config.plugins.piconcockpit.picon_server,
              None, None, 0, [], _("Select the picon server.")),
+            (_("Picon server mirrors"), config.plugins.piconcockpit.mirrors,
+             None, None, 1, [], _("Enter a comma separated list of mirrors of the picon server. Downloads are spread across the fastest healthy mirrors.")),
             (_("Download all picons"), config.plugins.piconcockpit.all_picons, None, None, 0, [
             ], _("Should all picons be downloaded vs. just the picons in favorites?")),
             (_("Delete picon directory"), config.plugins.piconcockpit.delete_before_download,
              None, None, 0, [], _("Should the picon directory be cleaned before the download?")),
+            (_("Sync mode"), config.plugins.piconcockpit.sync_mode,
+             None, None, 0, [], _("Should all picons be downloaded, only the picons that are missing or changed since their last download, or only the picons whose content differs from the manifest of the picon set?")),
+            (_("Delete picons removed from the set"), config.plugins.piconcockpit.delete_removed,
+             None, None, 0, [], _("Should picons that were removed from the picon set be deleted from the picon directory? Only used with the set manifest sync mode.")),
+            (_("Download picon archive"), config.plugins.piconcockpit.use_archive,
+             None, None, 0, [], _("Should the picon set be downloaded as one archive if the server offers it?")),
+            (_("Deduplicate picons"), config.plugins.piconcockpit.dedup_picons,
+             None, None, 0, [], _("Should identical picons be stored only once and linked to each other?")),
+            (_("Download via RAM spool"), config.plugins.piconcockpit.spool_downloads,
+             None, None, 1, [], _("Should picons be downloaded into RAM first and written to the picon directory in batches? This spares flash memory.")),
+            (_("RAM spool size"), config.plugins.piconcockpit.spool_size,
+             None, None, 1, [-1], _("Select how much RAM the spooled picons may use before they are written to the picon directory.")),
+            (_("Picon cache directory"), config.plugins.piconcockpit.cache_directory,
+             None, None, 1, [], _("Enter the directory of the picon cache. On the file system of the picon directory cached picons are hardlinked instead of copied.")),
+            (_("Picon cache size"), config.plugins.piconcockpit.cache_size,
+             None, None, 1, [], _("Select how much space the picon cache may use. Picons in the cache are not downloaded again when the picon directory or the picon set changes.")),
+            (_("Parallel downloads"), config.plugins.piconcockpit.max_downloads,
+             None, None, 0, [], _("Select how many picons are downloaded at the same time.")),
+            (_("Bandwidth limit"), config.plugins.piconcockpit.bandwidth_limit,
+             None, None, 0, [], _("Select the maximum bandwidth all picon downloads may use together.")),
+            (_("Unlimited bandwidth in standby"), config.plugins.piconcockpit.unlimited_in_standby,
+             None, None, 0, [], _("Should the bandwidth limit be lifted while the receiver is in standby?")),
+            (_("Download engine"), config.plugins.piconcockpit.download_engine,
+             None, None, 2, [], _("Select whether each download runs in its own thread or all downloads share a bounded pool of worker threads.")),
+            (self.section, _("SCHEDULE"), None, None, 0, [], ""),
+            (_("Scheduled sync"), config.plugins.piconcockpit.schedule_mode,
+             None, None, 0, [], _("Should the last picon set be synced in the background, daily at a set time and/or when the receiver enters standby? Only missing or changed picons are downloaded.")),
+            (_("Sync time"), config.plugins.piconcockpit.schedule_hour,
+             None, None, 0, [], _("Select the hour of the daily sync.")),
+            (_("Parallel downloads of a scheduled sync"), config.plugins.piconcockpit.schedule_max_downloads,
+             None, None, 1, [], _("Select how many picons a scheduled sync downloads at the same time.")),
+            (_("Bandwidth limit of a scheduled sync"), config.plugins.piconcockpit.schedule_bandwidth_limit,
+             None, None, 1, [], _("Select the maximum bandwidth a scheduled sync may use outside of standby.")),
             (self.section, _("FILTER"), None, None, 0, [], ""),
             (_("Satellite"), config.plugins.piconcockpit.satellite,
              None, None, 0, [], _("Select the satellite.")),
@@ -5,7 +5,11 @@
 
 import sys
 import logging
-from Components.config import config, ConfigSubsection, ConfigDirectory, ConfigSelection  # noqa: F401, pylint: disable=unused-import
+try:
+    from Components.config import config, ConfigSubsection, ConfigDirectory, ConfigSelection  # noqa: F401, pylint: disable=unused-import
+except ImportError:
+    # headless, e.g. the command line sync outside of Enigma2
+    config = None
 from .Version import ID, PLUGIN
 
 
@@ -15,8 +19,9 @@ format_string = ID + ": " + "%(levelname)s: %(filename)s: %(funcName)s: %(messag
 log_levels = {"ERROR": logging.ERROR, "INFO": logging.INFO, "DEBUG": logging.DEBUG}
 log_level_choices = list(log_levels.keys())
 plugin = PLUGIN.lower()
-exec("config.plugins." + plugin + " = ConfigSubsection()")  # noqa: F401, pylint: disable=exec-used
-exec("config.plugins." + plugin + ".debug_log_level = ConfigSelection(default='INFO', choices=log_level_choices)")  # noqa: F401, pylint: disable=exec-used
+if config is not None:
+    exec("config.plugins." + plugin + " = ConfigSubsection()")  # noqa: F401, pylint: disable=exec-used
+    exec("config.plugins." + plugin + ".debug_log_level = ConfigSelection(default='INFO', choices=log_level_choices)")  # noqa: F401, pylint: disable=exec-used
 
 
 def initLogging():
@@ -29,7 +34,10 @@ def initLogging():
         streamer.setFormatter(formatter)
         logger.addHandler(streamer)
         logger.propagate = False
-        setLogLevel(log_levels[eval("config.plugins." + plugin + ".debug_log_level").value])  # pylint: disable=eval-used
+        if config is not None:
+            setLogLevel(log_levels[eval("config.plugins." + plugin + ".debug_log_level").value])  # pylint: disable=eval-used
+        else:
+            setLogLevel(logging.ERROR)
 
 
 def setLogLevel(level):
@@ -0,0 +1,106 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import threading
+import time
+from collections import deque
+
+
+def formatBytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return "%d %s" % (size, unit) if unit == "B" else "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GB" % size
+
+
+def formatDuration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "%d:%02d:%02d" % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+    return "%d:%02d" % (seconds // 60, seconds % 60)
+
+
+def getPercentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class DownloadStats():
+    """Thread-safe byte, throughput and latency accounting of a download run"""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.total_bytes = 0
+        self.finished_files = 0
+        self.samples = deque([(self.start_time, 0)])
+        self.latencies = []
+        self.file_start_times = {}
+
+    def startFile(self, key):
+        with self.lock:
+            self.file_start_times[key] = time.monotonic()
+
+    def finishFile(self, key):
+        with self.lock:
+            start_time = self.file_start_times.pop(key, None)
+            if start_time is not None:
+                self.latencies.append(time.monotonic() - start_time)
+            self.finished_files += 1
+
+    def addBytes(self, size):
+        with self.lock:
+            self.total_bytes += size
+            now = time.monotonic()
+            # Keep at most ten samples per second for the moving window
+            if now - self.samples[-1][0] >= 0.1:
+                self.samples.append((now, self.total_bytes))
+                self.pruneSamples(now)
+
+    def pruneSamples(self, now):
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+            self.samples.popleft()
+
+    def getThroughput(self):
+        """Return the moving average throughput of the last window seconds in bytes per second"""
+        with self.lock:
+            now = time.monotonic()
+            self.pruneSamples(now)
+            since, since_bytes = self.samples[0]
+            duration = now - since
+            return (self.total_bytes - since_bytes) / duration if duration > 0 else 0
+
+    def getETA(self, remaining_files):
+        """Estimate the seconds left from the average file size and the current throughput"""
+        throughput = self.getThroughput()
+        with self.lock:
+            if not self.finished_files or not throughput:
+                return None
+            return remaining_files * (self.total_bytes / float(self.finished_files)) / throughput
+
+    def getLatencies(self):
+        """Return p50, p95 and max of the per-file latencies in seconds"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+        return getPercentile(latencies, 50), getPercentile(latencies, 95), latencies[-1] if latencies else 0
+
+    def getStats(self, remaining_files=0):
+        p50, p95, maximum = self.getLatencies()
+        elapsed = time.monotonic() - self.start_time
+        return {
+            "bytes": self.total_bytes,
+            "files": self.finished_files,
+            "elapsed": elapsed,
+            "throughput": self.getThroughput(),
+            "average_throughput": self.total_bytes / elapsed if elapsed > 0 else 0,
+            "eta": self.getETA(remaining_files),
+            "latency_p50": p50,
+            "latency_p95": p95,
+            "latency_max": maximum,
+        }
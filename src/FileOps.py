@@ -0,0 +1,112 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import threading
+from collections import deque
+from itertools import islice
+from .__init__ import _
+from .Debug import logger
+
+
+class FileOps():
+    """
+    GUI free engine that runs file ops from an execution source, with up to max_file_ops in flight
+    Progress and completion are reported through progress_callback and finished_callback,
+    so the same file ops run behind a progress screen and from the command line
+    """
+
+    def __init__(self):
+        # File ops are queued from the execution source in small batches, so long lists are never held in memory
+        self.execution_list = deque()
+        self.execution_source = None
+        self.refill_size = 64
+        self.max_file_ops = 1
+        self.active_file_ops = 0
+        self.file_ops_lock = threading.RLock()
+        self.total_files = 0
+        self.current_files = 0
+        self.file_name = ""
+        self.status = ""
+        self.request_cancel = False
+        self.cancelled = False
+        self.finished = False
+        self.progress_callback = None
+        self.finished_callback = None
+
+    def updateProgress(self):
+        if self.progress_callback:
+            self.progress_callback()
+
+    def progressInfo(self):
+        """Return extra progress information, overridden by child"""
+        return ""
+
+    def completionStatus(self):
+        return _("Done") + "."
+
+    def doFileOp(self, _afile):
+        logger.error("should not be called at all, as overridden by child")
+
+    def cancelFileOps(self):
+        """Abort the file ops in flight, overridden by child"""
+        return
+
+    def cancel(self):
+        if not self.finished:
+            self.request_cancel = True
+            self.status = _("Cancelling, please wait") + " ..."
+            self.updateProgress()
+            self.cancelFileOps()
+            self.dispatchFileOps()
+
+    def startFileOps(self):
+        logger.debug("max_file_ops: %s", self.max_file_ops)
+        self.dispatchFileOps()
+
+    def nextFileOp(self):
+        """Account for a finished file op and dispatch the next ones"""
+        logger.debug("...")
+        with self.file_ops_lock:
+            self.active_file_ops -= 1
+            self.current_files += 1
+        self.dispatchFileOps()
+
+    def dispatchFileOps(self):
+        """Fill the free file op slots from the execution list"""
+        afiles = []
+        with self.file_ops_lock:
+            if not self.request_cancel:
+                self.refillExecutionList()
+                while self.execution_list and self.active_file_ops < self.max_file_ops:
+                    afiles.append(self.execution_list.popleft())
+                    self.active_file_ops += 1
+            # A cancel finishes at once, file ops still in flight have been aborted and just report back
+            finished = not self.finished and (self.request_cancel or not (self.active_file_ops or self.execution_list))
+            if finished:
+                self.finished = True
+        for afile in afiles:
+            self.status = _("Please wait") + " ..."
+            self.doFileOp(afile)
+        if finished:
+            self.finishFileOps()
+
+    def setExecutionSource(self, source):
+        """Set the iterable the file ops are taken from, file ops that are already queued stay queued"""
+        with self.file_ops_lock:
+            self.execution_source = iter(source)
+
+    def refillExecutionList(self):
+        if self.execution_source is not None and len(self.execution_list) < self.max_file_ops:
+            self.execution_list.extend(islice(self.execution_source, max(self.refill_size, self.max_file_ops)))
+
+    def finishFileOps(self):
+        logger.debug("done.")
+        if self.request_cancel and self.current_files < self.total_files:
+            self.cancelled = True
+            self.status = _("Cancelled") + "."
+        else:
+            self.status = self.completionStatus()
+        if self.finished_callback:
+            self.finished_callback()
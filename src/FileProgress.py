@@ -3,6 +3,7 @@
 # License: GNU General Public License v3.0 (see LICENSE file for details)
 
 
+from enigma import eTimer
 from Components.ActionMap import ActionMap
 from Components.Label import Label
 from Components.Button import Button
@@ -14,7 +15,7 @@ from .Debug import logger
 
 class FileProgress(Screen):
 
-    def __init__(self, session):
+    def __init__(self, session, file_ops):
         logger.debug("...")
         Screen.__init__(self, session)
 
@@ -35,15 +36,21 @@ class FileProgress(Screen):
             {"ok": self.exit, "cancel": self.exit, "red": self.cancel, "green": self.exit, "yellow": self.noop, "blue": self.toggleHide}
         )
 
-        self.execution_list = []
-        self.total_files = 0
-        self.current_files = 0
-        self.file_progress = 0
-        self.file_name = ""
-        self.status = ""
-        self.request_cancel = False
-        self.cancelled = False
+        # The file ops run in a GUI free engine, the screen paints its progress
+        self.file_ops = file_ops
+        self.file_ops.progress_callback = self.updateProgress
+        self.file_ops.finished_callback = self.finishFileOps
         self.hidden = False
+        # The file ops may still write or link files after the last one finished, the screen closes once they reported back
+        self.done = False
+
+        # Progress changes are collected in memory and painted at a fixed frame rate
+        self.paint_interval = 200
+        self.progress_changed = False
+        self.paint_timer = eTimer()
+        self.paint_timer.callback.append(self.paintProgress)
+        self.paint_timer.start(self.paint_interval, False)
+        self.onClose.append(self.stopPaintTimer)
 
     def noop(self):
         return
@@ -52,22 +59,21 @@ class FileProgress(Screen):
         if self.hidden:
             logger.debug("unhide")
             self.toggleHide()
-        elif self.cancelled or (self.current_files > self.total_files):
+        elif self.done:
             self.exit()
-        else:
+        elif not self.file_ops.finished:
             logger.debug("trigger")
-            self.request_cancel = True
             self["key_red"].hide()
             self["key_blue"].hide()
             self["key_green"].hide()
-            self.status = _("Cancelling, please wait") + " ..."
+            self.file_ops.cancel()
 
     def exit(self):
         logger.info("...")
         if self.hidden:
             logger.debug("unhide")
             self.toggleHide()
-        elif self.cancelled or (self.current_files > self.total_files):
+        elif self.done:
             logger.debug("close")
             self.close()
 
@@ -80,48 +86,40 @@ class FileProgress(Screen):
             self.hide()
 
     def updateProgress(self):
-        logger.debug("file_name: %s, current_files: %s, total_files: %s, status: %s", self.file_name, self.current_files, self.total_files, self.status)
-        current_files = self.current_files if self.current_files <= self.total_files else self.total_files
-        msg = _("Processing") + ": " + str(current_files) + " " + _("of") + " " + str(self.total_files) + " ..."
+        """Mark the progress as changed, it is painted with the next frame"""
+        self.progress_changed = True
+
+    def paintProgress(self):
+        if not self.progress_changed:
+            return
+        self.progress_changed = False
+        file_ops = self.file_ops
+        logger.debug("file_name: %s, current_files: %s, total_files: %s, status: %s", file_ops.file_name, file_ops.current_files, file_ops.total_files, file_ops.status)
+        current_files = min(file_ops.current_files + file_ops.active_file_ops, file_ops.total_files)
+        msg = _("Processing") + ": " + str(current_files) + " " + _("of") + " " + str(file_ops.total_files) + " ..." + file_ops.progressInfo()
         self["operation"].setText(msg)
-        self["name"].setText(self.file_name)
-        percent_complete = int(round(float(self.current_files - 1) / float(self.total_files) * 100)) if self.total_files > 0 else 0
+        self["name"].setText(file_ops.file_name)
+        percent_complete = int(round(float(file_ops.current_files) / float(file_ops.total_files) * 100)) if file_ops.total_files > 0 else 0
         self["slider1"].setValue(percent_complete)
-        self["status"].setText(self.status)
-
-    def completionStatus(self):
-        return _("Done") + "."
-
-    def doFileOp(self, _afile):
-        logger.error("should not be called at all, as overridden by child")
-
-    def nextFileOp(self):
-        logger.debug("...")
-
-        self.current_files += 1
-        if self.request_cancel and (self.current_files <= self.total_files):
-            self.current_files -= 1
-            if self.hidden:
-                self.toggleHide()
-            self["key_red"].hide()
-            self["key_blue"].hide()
-            self["key_green"].show()
-            self.status = _("Cancelled") + "."
-            self.cancelled = True
-            self.updateProgress()
-        elif self.execution_list:
-            afile = self.execution_list.pop(0)
-            self.status = _("Please wait") + " ..."
-            self.doFileOp(afile)
-        else:
-            logger.debug("done.")
-            if self.hidden:
-                self.toggleHide()
-            self["key_red"].hide()
-            self["key_blue"].hide()
-            self["key_green"].show()
-            if self.cancelled:
-                self.status = _("Cancelled") + "."
-            else:
-                self.status = self.completionStatus()
-            self.updateProgress()
+        self["status"].setText(file_ops.status)
+
+    def flushProgress(self):
+        """Paint the final progress right away and stop the frame timer"""
+        self.stopPaintTimer()
+        self.progress_changed = True
+        self.paintProgress()
+
+    def stopPaintTimer(self):
+        self.paint_timer.stop()
+        if self.paintProgress in self.paint_timer.callback:
+            self.paint_timer.callback.remove(self.paintProgress)
+
+    def finishFileOps(self):
+        logger.debug("done.")
+        self.done = True
+        if self.hidden:
+            self.toggleHide()
+        self["key_red"].hide()
+        self["key_blue"].hide()
+        self["key_green"].show()
+        self.flushProgress()
@@ -33,6 +33,18 @@ def readFile(path, mode="r"):
     return data
 
 
+def iterFileLines(path):
+    """Yield the stripped, non-empty lines of a text file one by one"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+    except Exception as e:
+        logger.info("path: %s, exception: %s", path, e)
+
+
 def writeFile(path, data, mode="w"):
     try:
         if mode == "wb":
@@ -96,6 +108,31 @@ def createSymlink(src, dst):
         logger.error("src: %s, dst: %s, exception: %s", src, dst, e)
 
 
+def syncDirectory(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        logger.error("path: %s, exception: %s", path, e)
+
+
+def getFileSystemType(path):
+    """Return the type of the file system path is on, e.g. "tmpfs", or "" if it is unknown"""
+    path = os.path.realpath(path)
+    mount_point = ""
+    fs_type = ""
+    for line in iterFileLines("/proc/mounts"):
+        fields = line.split()
+        if len(fields) > 2:
+            mount = fields[1].replace("\\040", " ")
+            if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) >= len(mount_point):
+                mount_point, fs_type = mount, fields[2]
+    return fs_type
+
+
 def deleteDirectory(path):
     try:
         shutil.rmtree(path)
@@ -0,0 +1,160 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .Debug import logger
+from .FileUtils import readFile, writeFile, deleteFile, createDirectory
+from .PiconDedup import hashFile
+
+
+index_file = "index.json"
+
+
+def placeFile(src, dst):
+    """Replace dst by a hardlink to src, or by a copy if src is on another file system"""
+    tmp_path = dst + ".cache"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+class PiconCache():
+    """
+    Content addressable picon cache shared by all picon directories and picon sets
+    Objects are stored by content hash, urls map to the hash and the validators of their last
+    download. Objects are evicted least recently used first when the cache exceeds max_size.
+    Stores run in order on one worker thread, the index is saved after each batch of stores
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.index_path = os.path.join(cache_dir, index_file)
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.objects = {}
+        self.size = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PiconCache")
+        createDirectory(os.path.join(cache_dir, "objects"))
+        self.load()
+
+    def load(self):
+        data = readFile(self.index_path)
+        try:
+            index = json.loads(data) if data else {}
+            self.urls = index.get("urls", {})
+            self.objects = index.get("objects", {})
+        except ValueError as e:
+            logger.error("path: %s, exception: %s", self.index_path, e)
+            self.urls = {}
+            self.objects = {}
+        self.size = sum(size for size, _atime in self.objects.values())
+        logger.debug("urls: %s, objects: %s, size: %s", len(self.urls), len(self.objects), self.size)
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({"urls": self.urls, "objects": self.objects}, separators=(",", ":"))
+        tmp_path = self.index_path + ".tmp"
+        writeFile(tmp_path, data)
+        try:
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.error("path: %s, exception: %s", self.index_path, e)
+
+    def getObjectPath(self, content_hash):
+        return os.path.join(self.cache_dir, "objects", content_hash[:2], content_hash)
+
+    def lookup(self, content_hash):
+        """Return the path of the cached object of content_hash, or None"""
+        with self.lock:
+            entry = self.objects.get(content_hash)
+            if entry is None:
+                return None
+            entry[1] = int(time.time())
+        path = self.getObjectPath(content_hash)
+        return path if os.path.isfile(path) else None
+
+    def getUrlEntry(self, url):
+        """Return the content hash and the validators of the last download of url, if its object is still cached"""
+        with self.lock:
+            entry = self.urls.get(url)
+            if entry and entry["hash"] in self.objects:
+                return entry
+        return None
+
+    def materialize(self, content_hash, path):
+        """Place the cached object of content_hash at path, returns False on a cache miss"""
+        object_path = self.lookup(content_hash)
+        if object_path:
+            try:
+                placeFile(object_path, path)
+                return True
+            except OSError as e:
+                logger.error("path: %s, exception: %s", path, e)
+        return False
+
+    def materializeAsync(self, content_hash, path, callback):
+        """Place the cached object of content_hash at path on the worker thread, callback gets whether it was placed"""
+        self.executor.submit(lambda: callback(self.materialize(content_hash, path)))
+
+    def storeAsync(self, entries):
+        """Store a list of (url, path, response_headers) of downloaded files in the background"""
+        if entries:
+            self.executor.submit(self.store, entries)
+
+    def store(self, entries):
+        for url, path, response_headers in entries:
+            try:
+                content_hash = hashFile(path)
+                object_path = self.getObjectPath(content_hash)
+                with self.lock:
+                    cached = content_hash in self.objects
+                if not cached:
+                    createDirectory(os.path.dirname(object_path))
+                    placeFile(path, object_path)
+                    size = os.path.getsize(object_path)
+                with self.lock:
+                    if not cached:
+                        self.objects[content_hash] = [size, int(time.time())]
+                        self.size += size
+                    self.urls[url] = {
+                        "hash": content_hash,
+                        "etag": response_headers.get("etag", ""),
+                        "last_modified": response_headers.get("last-modified", ""),
+                    }
+            except (OSError, KeyError) as e:
+                logger.error("url: %s, exception: %s", url, e)
+        self.evict()
+        self.save()
+
+    def evict(self):
+        """Delete the least recently used objects until the cache fits into max_size"""
+        with self.lock:
+            if self.size <= self.max_size:
+                return
+            evicted = []
+            for content_hash, (size, _atime) in sorted(self.objects.items(), key=lambda item: item[1][1]):
+                if self.size <= self.max_size:
+                    break
+                del self.objects[content_hash]
+                self.size -= size
+                evicted.append(content_hash)
+            evicted_hashes = set(evicted)
+            self.urls = {url: entry for url, entry in self.urls.items() if entry["hash"] not in evicted_hashes}
+        for content_hash in evicted:
+            deleteFile(self.getObjectPath(content_hash))
+        logger.info("evicted: %s, size: %s", len(evicted), self.size)
+
+    def close(self):
+        # Stores that are queued still complete, the atimes of cache hits are saved last
+        self.executor.submit(self.save)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,66 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+from urllib.parse import urljoin, urlparse
+
+
+default_server = "http://picons.vuplus-support.org/"
+picon_info_file = "picon_info.txt"
+picon_list_file = "zz_picon_list.txt"
+compressed_variants = [".xz", ".gz"]
+
+
+def getCatalogUrl(server_url):
+    """Return the url of the picon set catalog of a picon server"""
+    server_url = str(server_url).strip()
+    if not server_url.startswith(("http://", "https://")):
+        server_url = "http://" + server_url
+    if not urlparse(server_url).netloc:
+        raise ValueError(f"Invalid URL format: {server_url}")
+    if not server_url.endswith("/"):
+        server_url += "/"
+    return urljoin(urljoin(server_url, "picons/"), picon_info_file)
+
+
+def parsePiconSet(line, server_url):
+    """
+    Parse a catalog line "<dir>;<preview>;<date>;<name>;<satellite>;<creator>;<bit>;<size>;<uploader>"
+    Return a dict of the picon set, or None for meta and incomplete lines
+    """
+    if line.startswith("<meta"):
+        return None
+    info_list = line.split(";")
+    if len(info_list) < 9:
+        return None
+    picon_set = {
+        "dir_url": os.path.join(server_url, info_list[0]),
+        "pic_url": os.path.join(server_url, info_list[0], info_list[1]),
+        "date": info_list[2],
+        "name": info_list[3],
+        "satellite": info_list[4],
+        "creator": info_list[5],
+        "bit": info_list[6].replace(" ", "").lower().replace("bit", " bit"),
+        "size": info_list[7].replace(" ", "").lower(),
+        "uploader": info_list[8],
+    }
+    picon_set["signature"] = "%(satellite)s | %(creator)s - %(name)s | %(size)s | %(bit)s | %(uploader)s" % picon_set
+    return picon_set
+
+
+def parseCatalog(lines, server_url):
+    """Return the picon sets of the catalog lines"""
+    return [picon_set for picon_set in (parsePiconSet(line, server_url) for line in lines) if picon_set]
+
+
+def findPiconSet(picon_sets, signature):
+    """Return the picon set with signature, or the only one whose signature contains it, else None"""
+    matches = []
+    for picon_set in picon_sets:
+        if picon_set["signature"] == signature:
+            return picon_set
+        if signature.lower() in picon_set["signature"].lower():
+            matches.append(picon_set)
+    return matches[0] if len(matches) == 1 else None
@@ -5,7 +5,7 @@
 
 import os
 import uuid
-from urllib.parse import urljoin, urlparse, quote
+from urllib.parse import urljoin, quote
 
 from Screens.Screen import Screen
 from Screens.MessageBox import MessageBox
@@ -19,19 +19,24 @@ from Tools.LoadPixmap import LoadPixmap
 
 from .ServiceDataCompat import getServiceList, getTVBouquets, getRadioBouquets
 from .WebRequestsAsync import WebRequestsAsync
+from .CompletionQueue import CompletionQueue
 from .Debug import logger
 from .__init__ import _
 from .FileUtils import readFile, createDirectory
 from .ConfigScreen import ConfigScreen
-from .PiconDownloadProgress import PiconDownloadProgress
+from .PiconDownloadProgress import PiconDownloadProgress, download_lock
+from .PiconMetadata import PiconMetadata
+from .PiconSync import getChangedFilter, getPiconName, PiconList
+from .PiconCatalog import picon_info_file, picon_list_file, compressed_variants, getCatalogUrl, parseCatalog
+from .BouquetScan import getBouquetPicons
+from .PiconPreflight import PiconPreflight
+from .PiconMirrors import MirrorSet, parseMirrorList
+from .PiconManifest import manifest_file, loadManifest, getManifestFilter, deleteRemovedPicons
+from .DownloadStats import formatBytes, formatDuration
 from .ConfigInit import ConfigInit
 from .SkinUtils import getSkinPath
 
 
-picon_info_file = "picon_info.txt"
-picon_list_file = "zz_picon_list.txt"
-
-
 class PiconCockpit(Screen):
     skin = readFile(getSkinPath("PiconCockpit.xml"))
 
@@ -39,7 +44,8 @@ class PiconCockpit(Screen):
         logger.info("...")
         Screen.__init__(self, session)
 
-        self.web_client = WebRequestsAsync()
+        self.completion_queue = CompletionQueue()
+        self.web_client = WebRequestsAsync(engine=config.plugins.piconcockpit.download_engine.value, completion_queue=self.completion_queue)
 
         self["actions"] = ActionMap(
             ["OkCancelActions", "ColorActions", "MenuActions"],
@@ -61,6 +67,8 @@ class PiconCockpit(Screen):
         self["key_red"] = Button(_("Exit"))
         self["key_menu"] = StaticText()
         self.first_start = True
+        self.manifest = None
+        self.mirrors = None
         self.onLayoutFinish.append(self.__onLayoutFinish)
         self.onClose.append(self.__onClose)
 
@@ -79,6 +87,7 @@ class PiconCockpit(Screen):
 
         if self.first_start:
             self.first_start = False
+            self.probeMirrors()
             self.getPiconSetInfo()
         else:
             self.createList(False)
@@ -91,30 +100,20 @@ class PiconCockpit(Screen):
         except (ValueError, AttributeError):
             # Callback might not be in list or list might not exist
             pass
+        self.web_client.close()
+        self.completion_queue.close()
+
+    def probeMirrors(self):
+        """Rank the picon server and its mirrors in the background, the ranking is used by the picon downloads"""
+        urls = parseMirrorList(config.plugins.piconcockpit.picon_server.value, config.plugins.piconcockpit.mirrors.value)
+        self.mirrors = MirrorSet(urls)
+        if len(urls) > 1:
+            self.mirrors.probe(self.web_client, urljoin("picons/", picon_info_file))
 
     def getPiconSetInfo(self):
         logger.info("...")
         try:
-            # Get server URL and clean it
-            server_url = config.plugins.piconcockpit.picon_server.value
-
-            # Clean and validate URL using standard functions
-            server_url = str(server_url).strip()
-
-            # Ensure proper protocol
-            if not server_url.startswith(('http://', 'https://')):
-                server_url = 'http://' + server_url
-
-            # Parse and validate URL
-            parsed = urlparse(server_url)
-            if not parsed.netloc:
-                raise ValueError(f"Invalid URL format: {server_url}")
-
-            # Construct URL using urllib.parse.urljoin for RFC 3986 compliance
-            if not server_url.endswith('/'):
-                server_url += '/'
-            base_url = urljoin(server_url, "picons/")
-            url = urljoin(base_url, str(picon_info_file))
+            url = getCatalogUrl(config.plugins.piconcockpit.picon_server.value)
             # Ensure proper file path handling
             download_file = os.path.join(str(self.picon_dir), str(picon_info_file))
 
@@ -131,7 +130,7 @@ class PiconCockpit(Screen):
             download_file = str(download_file)
 
             # Use WebRequestsAsync instead of twisted downloadPage
-            downloader = self.web_client.downloadFileAsync(url, download_file)
+            downloader = self.web_client.downloadFileAsync(url, download_file, resume=True, variants=compressed_variants)
             downloader.addCallback(self.gotPiconSetInfo).addErrback(self.downloadError)
             downloader.start()
         except Exception as e:
@@ -201,11 +200,17 @@ class PiconCockpit(Screen):
 
     def green(self):
         logger.info("...")
+        if download_lock.locked():
+            self.showErrorMessage(_("A scheduled picon sync is running, please try again later."))
+            return
         picon_set = self["list"].getCurrent()
         logger.debug("green: picon_set = %s", picon_set)
 
         try:
-            if picon_set:
+            if picon_set and not config.plugins.piconcockpit.all_picons.value:
+                # The picon list is only needed in all picons mode
+                self.downloadPicons(None, picon_set)
+            elif picon_set:
                 logger.debug("green: Processing picon_set[1] = %s", picon_set[1])
 
                 try:
@@ -226,7 +231,7 @@ class PiconCockpit(Screen):
                     download_file = str(download_file)
 
                     # Use WebRequestsAsync instead of twisted downloadPage
-                    downloader = self.web_client.downloadFileAsync(url, download_file)
+                    downloader = self.web_client.downloadFileAsync(url, download_file, resume=True, variants=compressed_variants)
                     downloader.addCallback(lambda result: self.downloadPiconsCallback(result, picon_set))
                     downloader.addErrback(lambda error: self.downloadError(error, url))
                     downloader.start()
@@ -257,54 +262,52 @@ class PiconCockpit(Screen):
             picon_list_path = os.path.join(self.picon_dir, picon_list_file)
             logger.debug("downloadPicons: Reading picon list from %s", picon_list_path)
 
-            try:
-                picons = readFile(picon_list_path).splitlines()
-                logger.debug("downloadPicons: Found %d picons in list", len(picons))
-            except Exception as e:
-                logger.error("downloadPicons: Error reading picon list: %s", e)
+            if not os.path.isfile(picon_list_path):
+                logger.error("downloadPicons: Picon list not found: %s", picon_list_path)
                 self.showErrorMessage(_("Error reading picon list file"))
                 return
 
+            # The picon list is streamed from the file, the current service and the favourites come first
+            picons = PiconList(picon_list_path, self.getPriorityPicons())
             self.startPiconDownload(picon_set, picons)
         else:
             logger.info("Using bouquet picons mode")
             picons = self.getUserBouquetPicons()
             logger.debug("downloadPicons: Got %d bouquet picons", len(picons) if picons else 0)
-            self.startPiconDownload(picon_set, picons)
+            self.startPiconDownload(picon_set, PiconList(picons, self.getPriorityPicons(picons)))
 
     def getUserBouquetPicons(self):
         """Get user bouquet picons"""
         logger.info("...")
-        picons = []
-
         try:
-            services = self.listBouquetServices()
-            logger.debug("Processing %d services", len(services))
-
-            processed_count = 0
-            for service in services:
-                processed_count += 1
-                # Log progress every 100 services to avoid spam but show we're working
-                if processed_count % 100 == 0:
-                    logger.debug("Processed %d/%d services", processed_count, len(services))
-
-                try:
-                    ref = service[0]
-                    ref = ref.replace(":", "_")
-                    ref = ref[:len(ref) - 1]
-                    picon = ref + ".png"
-
-                    if picon.startswith("1_"):
-                        picons.append(picon)
-                except Exception as e:
-                    logger.error("Error processing service %s: %s", service, e)
-                    continue
-
-            return picons
+            return getBouquetPicons(self.listBouquetServices())
         except Exception as e:
-            logger.error("Error in getUserBouquetPiconsWithTimeout: %s", e)
+            logger.error("Error in getUserBouquetPicons: %s", e)
             return []
 
+    def getCurrentServicePicon(self):
+        """Get the picon of the service that is currently playing"""
+        try:
+            service_ref = self.session.nav.getCurrentlyPlayingServiceReference()
+            if service_ref:
+                picon = getPiconName(service_ref.toString())
+                if picon.startswith("1_"):
+                    return picon
+        except Exception as e:
+            logger.error("Error getting current service: %s", e)
+        return None
+
+    def getPriorityPicons(self, bouquet_picons=None):
+        """Get the picons to download first: the current service, then the bouquet picons in bouquet order"""
+        priority_picons = []
+        current_picon = self.getCurrentServicePicon()
+        if current_picon:
+            priority_picons.append(current_picon)
+        if bouquet_picons is None:
+            bouquet_picons = self.getUserBouquetPicons()
+        priority_picons.extend(bouquet_picons)
+        return priority_picons
+
     def listBouquetServices(self):
         """List bouquet services"""
         logger.info("...")
@@ -352,19 +355,103 @@ class PiconCockpit(Screen):
         """Start the picon download process"""
         logger.info("...")
         logger.debug("startPiconDownload: picon_set = %s", picon_set)
-        logger.debug("startPiconDownload: picons count = %d", len(picons) if picons else 0)
-
         if not picons:
             logger.warning("startPiconDownload: No picons to download")
             return
 
+        self.manifest = None
+        if config.plugins.piconcockpit.sync_mode.value == "manifest":
+            self.startManifestSync(picon_set, picons)
+            return
+        if config.plugins.piconcockpit.sync_mode.value == "changed":
+            picons.setFilter(getChangedFilter(self.picon_dir, PiconMetadata(self.picon_dir)))
+        self.preflightPiconDownload(picon_set, picons)
+
+    def startManifestSync(self, picon_set, picons):
+        """Download the manifest of the picon set, it is only transferred again if it changed"""
+        logger.info("...")
+        metadata = PiconMetadata(self.picon_dir)
+        picon_set_url = str(picon_set[1])
+        if not picon_set_url.endswith('/'):
+            picon_set_url += '/'
+        url = urljoin(picon_set_url, manifest_file)
+        downloader = self.web_client.downloadFileAsync(url, os.path.join(self.picon_dir, manifest_file), metadata.getRequestHeaders(manifest_file), variants=compressed_variants)
+        downloader.addCallback(lambda _result: self.manifestDownloaded(picon_set, picons, metadata, downloader))
+        downloader.addErrback(lambda error: self.manifestError(picon_set, picons, metadata, error))
+        downloader.start()
+
+    def manifestDownloaded(self, picon_set, picons, metadata, downloader):
+        logger.info("not_modified: %s", downloader.not_modified)
+        if not downloader.not_modified:
+            metadata.update(manifest_file, downloader.response_headers)
+        # Parsing the manifest and hashing new local picons runs off the main loop
+        self.web_client.engine.submit(lambda: self.loadManifest(picon_set, picons, metadata))
+
+    def loadManifest(self, picon_set, picons, metadata):
+        manifest, error = None, None
+        try:
+            manifest = loadManifest(self.picon_dir, metadata)
+        except Exception as e:
+            logger.error("exception: %s", e)
+            error = e
+        finally:
+            # The main loop always hears back, an unreadable manifest falls back to changed picons
+            self.completion_queue.put(self.manifestLoaded, picon_set, picons, metadata, manifest, error)
+
+    def manifestLoaded(self, picon_set, picons, metadata, manifest, error=None):
+        logger.info("manifest: %s", len(manifest) if manifest else 0)
+        if not manifest:
+            self.manifestError(picon_set, picons, metadata, error or "empty manifest")
+            return
+        if config.plugins.piconcockpit.delete_removed.value:
+            deleteRemovedPicons(manifest, self.picon_dir, metadata, picon_set[1])
+        metadata.save()
+        self.manifest = manifest
+        picons.setFilter(getManifestFilter(manifest, self.picon_dir, metadata))
+        self.preflightPiconDownload(picon_set, picons)
+
+    def manifestError(self, picon_set, picons, metadata, error):
+        # Without a manifest the picons are checked against the metadata of their last download
+        logger.info("falling back to changed picons, error: %s", error)
+        picons.setFilter(getChangedFilter(self.picon_dir, metadata))
+        self.preflightPiconDownload(picon_set, picons)
+
+    def preflightPiconDownload(self, picon_set, picons):
+        # Estimate the download size and let the user confirm it against the free space, the estimate also counts the picons
+        preflight = PiconPreflight(self.web_client, picon_set[1], picons, self.picon_dir, config.plugins.piconcockpit.last_throughput.value * 1024)
+        preflight.start(lambda estimate: self.confirmPiconDownload(picon_set, picons, estimate))
+
+    def confirmPiconDownload(self, picon_set, picons, estimate):
+        """Show count, bytes and expected duration of the download and ask for confirmation"""
+        logger.info("...")
+        if not estimate["count"]:
+            self.session.open(MessageBox, _("All picons are up to date."), MessageBox.TYPE_INFO)
+            return
+        message = _("Download %d picons?") % estimate["count"]
+        if estimate["bytes"] is not None:
+            message += "\n" + _("Size") + ": " + formatBytes(estimate["bytes"])
+        if estimate["needed"] is not None and estimate["free"] is not None:
+            message += "\n" + _("Needed / free space") + ": " + formatBytes(estimate["needed"]) + " / " + formatBytes(estimate["free"])
+        if estimate["duration"] is not None:
+            message += "\n" + _("Expected duration") + ": " + formatDuration(estimate["duration"])
+        enough_space = estimate["needed"] is None or estimate["free"] is None or estimate["needed"] <= estimate["free"]
+        if not enough_space:
+            message = _("There is not enough free space in the picon directory!") + "\n\n" + message
+        self.session.openWithCallback(
+            lambda answer: answer and self.openPiconDownloadProgress(picon_set, picons),
+            MessageBox, message, MessageBox.TYPE_YESNO, default=enough_space
+        )
+
+    def openPiconDownloadProgress(self, picon_set, picons):
         # Start the picon download progress screen with correct parameters
         # picon_set[1] is the dir_url from our data structure
         self.session.open(
             PiconDownloadProgress,
             picon_set[1],   # picon_set_url
             picons,         # picons list
-            self.picon_dir  # picon_dir
+            self.picon_dir,  # picon_dir
+            self.manifest,  # manifest of a manifest sync
+            self.mirrors    # mirrors of the picon server
         )
 
     def downloadAllPiconsCallback(self, answer):
@@ -373,14 +460,14 @@ class PiconCockpit(Screen):
         if answer:
             try:
                 # Read all picons from list file
-                picons = readFile(os.path.join(self.picon_dir, picon_list_file)).splitlines()
+                picons = PiconList(os.path.join(self.picon_dir, picon_list_file), self.getPriorityPicons())
                 if picons:
                     picon_set = self["list"].getCurrent()
                     if picon_set:
                         if config.plugins.piconcockpit.delete_before_download:
                             os.popen("rm " + os.path.join(self.picon_dir, "*.png"))
                         self.session.open(PiconDownloadProgress,
-                                          picon_set[1], picons, self.picon_dir)
+                                          picon_set[1], picons, self.picon_dir, None, self.mirrors)
                     else:
                         self.showErrorMessage(_("No picon set selected"))
                 else:
@@ -429,15 +516,11 @@ class PiconCockpit(Screen):
         bit_list = {"all"}
         creator_list = {"all"}
         satellite_list = {"all"}
-        for picon_set in picon_set_list:
-            if not picon_set.startswith('<meta'):
-                info_list = picon_set.split(';')
-                if len(info_list) >= 9:
-                    satellite_list.add(info_list[4])
-                    creator_list.add(info_list[5])
-                    bit_list.add(info_list[6].replace(
-                        ' ', '').lower().replace('bit', ' bit'))
-                    size_list.add(info_list[7].replace(' ', '').lower())
+        for picon_set in parseCatalog(picon_set_list, config.plugins.piconcockpit.picon_server.value):
+            satellite_list.add(picon_set["satellite"])
+            creator_list.add(picon_set["creator"])
+            bit_list.add(picon_set["bit"])
+            size_list.add(picon_set["size"])
         if picon_set_list:
             config_init = ConfigInit()
             config_init._updateFilterChoices(list(size_list), list(bit_list),
@@ -450,40 +533,24 @@ class PiconCockpit(Screen):
         logger.debug("Processing %d picon set entries", len(picon_set_list))
 
         picon_list = []
-        for picon_set in picon_set_list:
-            if not picon_set.startswith('<meta'):
-                info_list = picon_set.split(';')
-                if len(info_list) >= 9:
-                    dir_url = os.path.join(
-                        config.plugins.piconcockpit.picon_server.value, info_list[0])
-                    pic_url = os.path.join(
-                        config.plugins.piconcockpit.picon_server.value, info_list[0], info_list[1])
-                    date = info_list[2]
-                    name = info_list[3]
-                    satellite = info_list[4]
-                    creator = info_list[5]
-                    bit = (info_list[6].replace(
-                        ' ', '').lower()).replace('bit', ' bit')
-                    size = info_list[7].replace(' ', '').lower()
-                    uploader = info_list[8]
-                    identifier = str(uuid.uuid4())
-                    signature = f"{satellite} | {creator} - {name} | {size} | {bit} | {uploader}"
-                    display_name = f"{signature} | {date}"
-                    # Apply filter configuration
-                    satellite_filter = config.plugins.piconcockpit.satellite.value
-                    creator_filter = config.plugins.piconcockpit.creator.value
-                    size_filter = config.plugins.piconcockpit.size.value
-                    bit_filter = config.plugins.piconcockpit.bit.value
-
-                    if satellite_filter in ["all", satellite] and\
-                            creator_filter in ["all", creator] and\
-                            size_filter in ["all", size] and\
-                            bit_filter in ["all", bit]:
-                        picon_list.append(
-                            (display_name, dir_url, pic_url, identifier, signature))
-                    else:
-                        logger.debug("Filtered out: satellite=%s (filter=%s), creator=%s (filter=%s), size=%s (filter=%s), bit=%s (filter=%s)",
-                                     satellite, satellite_filter, creator, creator_filter, size, size_filter, bit, bit_filter)
+        # Apply filter configuration
+        satellite_filter = config.plugins.piconcockpit.satellite.value
+        creator_filter = config.plugins.piconcockpit.creator.value
+        size_filter = config.plugins.piconcockpit.size.value
+        bit_filter = config.plugins.piconcockpit.bit.value
+        for picon_set in parseCatalog(picon_set_list, config.plugins.piconcockpit.picon_server.value):
+            satellite, creator, size, bit = picon_set["satellite"], picon_set["creator"], picon_set["size"], picon_set["bit"]
+            if satellite_filter in ["all", satellite] and\
+                    creator_filter in ["all", creator] and\
+                    size_filter in ["all", size] and\
+                    bit_filter in ["all", bit]:
+                identifier = str(uuid.uuid4())
+                display_name = f"{picon_set['signature']} | {picon_set['date']}"
+                picon_list.append(
+                    (display_name, picon_set["dir_url"], picon_set["pic_url"], identifier, picon_set["signature"]))
+            else:
+                logger.debug("Filtered out: satellite=%s (filter=%s), creator=%s (filter=%s), size=%s (filter=%s), bit=%s (filter=%s)",
+                             satellite, satellite_filter, creator, creator_filter, size, size_filter, bit, bit_filter)
         logger.debug("Returning picon_list with %d items", len(picon_list))
         return picon_list
 
@@ -0,0 +1,95 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import hashlib
+from .Debug import logger
+
+
+def hashFile(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def parseHashList(data):
+    """Parse a sha1sum style list of "<hash>  <picon>" lines into a dict of picon: hash"""
+    hashes = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            hashes[fields[1].lstrip("*")] = fields[0].lower()
+    return hashes
+
+
+def linkFile(src, dst):
+    """Replace dst by a hardlink to src, or by a relative symlink if hardlinks are not possible"""
+    if os.path.lexists(dst) and os.path.samefile(src, dst):
+        # renaming onto a hardlink of the same file is a no-op that would leave the temporary link behind
+        return
+    tmp_path = dst + ".link"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        os.symlink(os.path.relpath(src, os.path.dirname(dst)), tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def linkPicons(picon_dir, links):
+    """Create the picons of a dict of picon: original picon as links to the downloaded originals"""
+    linked = []
+    for picon, original in links.items():
+        original_path = os.path.join(picon_dir, original)
+        if os.path.isfile(original_path):
+            try:
+                linkFile(original_path, os.path.join(picon_dir, picon))
+                linked.append(picon)
+            except OSError as e:
+                logger.error("picon: %s, exception: %s", picon, e)
+    logger.info("linked: %s of %s", len(linked), len(links))
+    return linked
+
+
+def dedupPicons(picon_dir, metadata=None):
+    """
+    Replace identical picons in picon_dir by links to one copy
+    Only files of equal size are hashed, hashes that are still valid in the metadata are reused
+    Returns the dict of linked picon: content hash and the bytes saved
+    """
+    sizes = {}
+    inodes = set()
+    with os.scandir(picon_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".png") and entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                # Hardlinks of a picon that is already deduplicated are skipped
+                if (stat.st_dev, stat.st_ino) not in inodes:
+                    inodes.add((stat.st_dev, stat.st_ino))
+                    sizes.setdefault(stat.st_size, []).append((entry.name, int(stat.st_mtime)))
+    linked = {}
+    saved_bytes = 0
+    for size, picons in sizes.items():
+        if len(picons) < 2:
+            continue
+        originals = {}
+        for picon, mtime in sorted(picons):
+            path = os.path.join(picon_dir, picon)
+            try:
+                digest = metadata.getHash(picon, size, mtime) if metadata else None
+                if digest is None:
+                    digest = hashFile(path)
+                    if metadata:
+                        metadata.setStatHash(picon, size, mtime, digest)
+                original = originals.setdefault(digest, path)
+                if original != path:
+                    linkFile(original, path)
+                    linked[picon] = digest
+                    saved_bytes += size
+            except OSError as e:
+                logger.error("picon: %s, exception: %s", picon, e)
+    logger.info("linked: %s, saved_bytes: %s", len(linked), saved_bytes)
+    return linked, saved_bytes
@@ -0,0 +1,502 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import time
+from urllib.parse import urljoin
+
+from .WebRequestsAsync import WebRequestsAsync, Downloader, CircuitOpenError, isRetryable, isNotFound
+from .Debug import logger
+from .__init__ import _
+from .FileOps import FileOps
+from .PiconDedup import parseHashList, linkPicons, dedupPicons
+from .PiconMetadata import PiconMetadata
+from .PiconSpool import PiconSpool, spool_root
+from .PiconSync import PiconList
+from .PiconCache import PiconCache
+from .PiconManifest import getManifestSource
+from .DownloadStats import DownloadStats, formatBytes, formatDuration
+
+
+picon_archive_files = ["picons.tar.gz", "picons.tar", "picons.zip"]
+picon_hash_file = "zz_picon_hashes.txt"
+
+
+class DownloadOptions():
+    """Settings of a picon download, taken from the plugin config or from the command line"""
+
+    def __init__(self, **kwargs):
+        self.max_downloads = 4
+        self.engine = "threads"
+        self.bandwidth_limit = None  # function returning the limit in bytes per second, 0 for unlimited
+        self.use_archive = False
+        self.dedup = False
+        self.spool_size = 0  # bytes, 0 writes directly to the picon directory
+        self.spool_directory = spool_root  # must be on a RAM file system
+        self.cache_directory = ""
+        self.cache_size = 0  # bytes, 0 disables the picon cache
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise TypeError("unknown download option: %s" % key)
+            setattr(self, key, value)
+
+
+class PiconDownload(FileOps):
+    """
+    GUI free picon download engine of a picon set into a picon directory
+    All callbacks run on the thread that drains completion_queue, the Enigma2 main loop
+    in the plugin or the loop of the command line sync
+    """
+
+    def __init__(self, picon_set_url, picons, picon_dir, options, completion_queue, manifest=None, mirrors=None):
+        logger.debug("...")
+        FileOps.__init__(self)
+        self.picon_set_url = picon_set_url
+        self.picons = picons
+        self.picon_dir = picon_dir
+        self.options = options
+        self.manifest = manifest
+        self.mirrors = mirrors if mirrors and len(mirrors) > 1 else None
+        self.max_downloads = options.max_downloads
+        # Initialize WebRequestsAsync client with one keep-alive connection per parallel download
+        # Completions are queued by the worker threads and handled by the thread that drains the queue
+        self.completion_queue = completion_queue
+        self.web_client = WebRequestsAsync(pool_size=self.max_downloads, engine=options.engine, completion_queue=self.completion_queue)
+        if options.bandwidth_limit:
+            self.web_client.rate_limiter.policy = options.bandwidth_limit
+        self.max_file_ops = self.max_downloads
+        self.metadata = PiconMetadata(self.picon_dir)
+        self.downloaded_files = 0
+        self.unchanged_files = 0
+        self.failed_files = 0
+        self.skipped_files = 0
+        self.missing_files = 0
+        self.retries = 0
+        self.archive_picons = set()
+        self.linked_picons = {}
+        self.deduplicated_files = 0
+        self.saved_bytes = 0
+        self.active_requests = set()
+        self.stats = DownloadStats()
+        self.spool = None
+        self.spool_commits = 0
+        self.cache = None
+        self.cache_entries = []
+        self.cached_files = 0
+        self.picon_hashes = {}
+        if options.cache_size:
+            try:
+                self.cache = PiconCache(options.cache_directory, options.cache_size)
+            except OSError as e:
+                logger.error("no picon cache, exception: %s", e)
+        if options.spool_size:
+            try:
+                self.spool = PiconSpool(self.picon_dir, options.spool_size, root=options.spool_directory)
+            except OSError as e:
+                logger.error("writing directly to picon_dir, exception: %s", e)
+
+    def close(self):
+        logger.debug("...")
+        self.web_client.close()
+        with self.file_ops_lock:
+            active_requests = list(self.active_requests)
+        # Downloads that did not report back after a cancel must not leave their partial files behind
+        for request in active_requests:
+            if isinstance(request, Downloader) and not request.resume:
+                request.removePartialFile()
+        if self.spool:
+            self.spool.close()
+        if self.cache:
+            self.cache.close()
+
+    def getSetUrl(self, mirror=None):
+        """Return the url of the picon set, on mirror or on the best mirror if there are mirrors"""
+        picon_set_url = str(self.picon_set_url)
+        if not picon_set_url.endswith('/'):
+            picon_set_url += '/'
+        if self.mirrors:
+            picon_set_url = self.mirrors.getUrl(mirror or self.mirrors.getRanked()[0], picon_set_url)
+        return picon_set_url
+
+    def doFileOp(self, entry):
+        picon = entry
+        self.file_name = picon
+        self.status = _("Please wait") + " ..."
+        self.updateProgress()
+        self.downloadPicon(picon)
+
+    def getCacheUrl(self, picon):
+        # The picon url on the primary server, so the cache entry is the same for all mirrors
+        picon_set_url = str(self.picon_set_url)
+        if not picon_set_url.endswith('/'):
+            picon_set_url += '/'
+        return urljoin(picon_set_url, picon)
+
+    def getPiconHash(self, picon):
+        """Return the content hash of the server picon from the manifest or the hash list, or None"""
+        remote = self.manifest.get(picon) if self.manifest else None
+        return remote[1] if remote else self.picon_hashes.get(picon)
+
+    def downloadPicon(self, picon, tried_mirrors=(), use_cache=True):
+        url = None
+        cache_hash = None
+        headers = self.metadata.getRequestHeaders(picon)
+        if self.cache and use_cache and not tried_mirrors:
+            content_hash = self.getPiconHash(picon)
+            if content_hash:
+                self.materializePicon(picon, content_hash, {})
+                return
+            url_entry = self.cache.getUrlEntry(self.getCacheUrl(picon))
+            if url_entry and not headers:
+                # A picon that was downloaded before, e.g. into another picon directory, is only revalidated
+                cache_hash = url_entry["hash"]
+                headers = {"If-None-Match": url_entry["etag"]} if url_entry["etag"] else {"If-Modified-Since": url_entry["last_modified"]}
+        mirror = self.mirrors.acquire(tried_mirrors) if self.mirrors else None
+        start_time = time.time()
+        try:
+            # Proper URL construction for picon download
+            url = urljoin(self.getSetUrl(mirror), str(picon))
+
+            download_file = self.spool.getPath(str(picon)) if self.spool else os.path.join(str(self.picon_dir), str(picon))
+
+            logger.debug("url: %s, download_file: %s", url, download_file)
+
+            # Use WebRequestsAsync instead of twisted downloadPage
+            downloader = self.web_client.downloadFileAsync(url, download_file, headers)
+            if mirror and len(tried_mirrors) + 1 < len(self.mirrors):
+                # A transient error moves the picon on to the next mirror at once instead of backing off on this one
+                downloader.retries = 0
+            downloader.addCallback(lambda result: self.downloadSuccess(result, picon, downloader, mirror, start_time, cache_hash))
+            downloader.addErrback(lambda error: self.downloadError(error, url, downloader, picon, mirror, tried_mirrors))
+            downloader.addProgback(self.createProgback())
+            self.stats.startFile(downloader)
+            self.startRequest(downloader)
+        except Exception as e:
+            logger.error("Error in downloadFile: %s", e)
+            self.downloadError(str(e), url if url else "unknown", mirror=mirror)
+
+    def createProgback(self):
+        """Return a progback that feeds the bytes of one download into the stats"""
+        last = [0]
+
+        def progback(downloaded, _total_size, _progress):
+            if downloaded < last[0]:
+                # the download restarted after a retry
+                last[0] = 0
+            self.stats.addBytes(downloaded - last[0])
+            last[0] = downloaded
+        return progback
+
+    def getStats(self):
+        """Return bytes, throughput, ETA and per-file latency of the current run"""
+        with self.file_ops_lock:
+            remaining_files = self.total_files - self.current_files
+        return self.stats.getStats(remaining_files)
+
+    def progressInfo(self):
+        stats = self.getStats()
+        info = "  " + formatBytes(stats["bytes"]) + ", " + formatBytes(stats["throughput"]) + "/s"
+        if stats["eta"] is not None and not self.finished:
+            info += ", " + _("ETA") + " " + formatDuration(stats["eta"])
+        return info
+
+    def startRequest(self, request):
+        with self.file_ops_lock:
+            self.active_requests.add(request)
+        request.start()
+
+    def cancelFileOps(self):
+        with self.file_ops_lock:
+            active_requests = list(self.active_requests)
+        logger.info("active_requests: %s", len(active_requests))
+        for request in active_requests:
+            request.cancel()
+
+    def materializePicon(self, picon, content_hash, response_headers):
+        # Placing the cached picon touches the disk, so it runs on the cache worker and only the completion is queued
+        self.cache.materializeAsync(
+            content_hash, os.path.join(self.picon_dir, picon),
+            lambda placed: self.completion_queue.put(self.materializeFinished, picon, placed, response_headers)
+        )
+
+    def materializeFinished(self, picon, placed, response_headers):
+        if placed:
+            self.cacheHit(picon, response_headers)
+        else:
+            self.downloadPicon(picon, use_cache=False)
+
+    def cacheHit(self, picon, response_headers):
+        with self.file_ops_lock:
+            self.cached_files += 1
+        self.updateMetadata(picon, response_headers, cache=False)
+        self.nextFileOp()
+
+    def downloadSuccess(self, _result=None, picon=None, downloader=None, mirror=None, start_time=0, cache_hash=None):
+        # logger.info("...")
+        if mirror:
+            self.mirrors.release(mirror, time.time() - start_time)
+        self.stats.finishFile(downloader)
+        if downloader.not_modified and cache_hash:
+            with self.file_ops_lock:
+                self.active_requests.discard(downloader)
+            self.materializePicon(picon, cache_hash, downloader.response_headers)
+            return
+        if self.spool and self.finished and not downloader.not_modified:
+            # The last batch has been committed already, a picon that completes after a cancel is dropped with the spool
+            logger.debug("dropped: %s", picon)
+            with self.file_ops_lock:
+                self.active_requests.discard(downloader)
+            return
+        with self.file_ops_lock:
+            self.active_requests.discard(downloader)
+            self.retries += downloader.retry_count
+            if downloader.not_modified:
+                self.unchanged_files += 1
+            else:
+                self.downloaded_files += 1
+        if self.spool and not downloader.not_modified:
+            # The metadata of a spooled picon is updated once it has been committed to the picon directory
+            if self.spool.add(picon, downloader.response_headers):
+                self.commitSpool()
+        elif not downloader.not_modified:
+            self.updateMetadata(picon, downloader.response_headers)
+        self.nextFileOp()
+
+    def downloadError(self, result, url, downloader=None, picon=None, mirror=None, tried_mirrors=()):
+        logger.info("url: %s, result: %s", url, result)
+        # A missing picon is not held against the mirror and not tried on the next one, it may just not be in the set
+        mirror_failed = isinstance(result, CircuitOpenError) or isRetryable(result)
+        if mirror:
+            self.mirrors.release(mirror)
+            if mirror_failed:
+                self.mirrors.recordFailure(mirror)
+        with self.file_ops_lock:
+            if downloader:
+                self.stats.finishFile(downloader)
+                self.active_requests.discard(downloader)
+                self.retries += downloader.retry_count
+            # The picon is tried on the next mirror, it keeps its file op slot
+            retry_mirror = mirror and picon and mirror_failed and not self.request_cancel and len(tried_mirrors) + 1 < len(self.mirrors)
+            if retry_mirror:
+                self.retries += 1
+        if retry_mirror:
+            self.downloadPicon(picon, tried_mirrors + (mirror,))
+            return
+        with self.file_ops_lock:
+            if isinstance(result, CircuitOpenError):
+                self.skipped_files += 1
+            elif isNotFound(result):
+                self.missing_files += 1
+            else:
+                self.failed_files += 1
+        self.nextFileOp()
+
+    def updateMetadata(self, picon, response_headers, cache=True):
+        self.metadata.update(picon, response_headers)
+        if self.cache and cache:
+            self.cache_entries.append((self.getCacheUrl(picon), os.path.join(self.picon_dir, picon), response_headers))
+            if len(self.cache_entries) >= 100:
+                self.storeCacheEntries()
+        # The manifest hash is taken over if the written picon has the size the manifest lists for it
+        remote = self.manifest.get(picon) if self.manifest else None
+        entry = self.metadata.getEntry(picon)
+        if remote and entry and entry.get("size") == remote[0]:
+            self.metadata.setHash(picon, remote[1])
+            self.metadata.setSource(picon, getManifestSource(self.picon_set_url))
+
+    def storeCacheEntries(self):
+        self.cache.storeAsync(self.cache_entries)
+        self.cache_entries = []
+
+    def commitSpool(self):
+        batch = self.spool.takeBatch()
+        if batch:
+            self.spool_commits += 1
+            self.web_client.engine.submit(lambda: self.writeSpoolBatch(batch))
+
+    def writeSpoolBatch(self, batch):
+        committed, failed = [], [picon for picon, _response_headers in batch]
+        try:
+            committed, failed = self.spool.commit(batch)
+        except Exception as e:
+            logger.error("exception: %s", e)
+        finally:
+            # The download only finishes once all batches have reported back
+            self.completion_queue.put(self.spoolCommitted, committed, failed)
+
+    def spoolCommitted(self, committed, failed):
+        for picon, response_headers in committed:
+            self.updateMetadata(picon, response_headers)
+        with self.file_ops_lock:
+            self.downloaded_files -= len(failed)
+            self.failed_files += len(failed)
+        self.spool_commits -= 1
+        if self.finished and not self.spool_commits:
+            self.finishDownloads()
+
+    def finishFileOps(self):
+        if self.spool:
+            self.commitSpool()
+            if self.spool_commits:
+                self.status = _("Writing picons") + " ..."
+                self.updateProgress()
+                return
+        self.finishDownloads()
+
+    def finishDownloads(self):
+        self.metadata.save()
+        if self.cache:
+            self.storeCacheEntries()
+        if self.options.dedup and not self.request_cancel:
+            self.status = _("Deduplicating picons") + " ..."
+            self.updateProgress()
+            # Hashing a large picon directory takes a while, so it runs off the main loop
+            self.web_client.engine.submit(self.dedupPicons)
+        else:
+            FileOps.finishFileOps(self)
+
+    def dedupPicons(self):
+        linked, deduplicated, saved_bytes = [], {}, 0
+        try:
+            linked = linkPicons(self.picon_dir, self.linked_picons)
+            deduplicated, saved_bytes = dedupPicons(self.picon_dir, self.metadata)
+            saved_bytes += sum(os.path.getsize(os.path.join(self.picon_dir, picon)) for picon in linked)
+        except Exception as e:
+            logger.error("picon_dir: %s, exception: %s", self.picon_dir, e)
+        finally:
+            # The download only finishes once dedup has reported back, also after an error
+            self.completion_queue.put(self.dedupFinished, linked, deduplicated, saved_bytes)
+
+    def dedupFinished(self, linked, deduplicated, saved_bytes):
+        logger.info("linked: %s, saved_bytes: %s", len(linked), saved_bytes)
+        for picon in linked:
+            self.metadata.updateStat(picon, self.linked_picons[picon])
+        # A deduplicated picon takes the stat of its original, so its entry must not look changed on disk
+        for picon, content_hash in deduplicated.items():
+            self.metadata.updateLink(picon, content_hash)
+        self.metadata.save()
+        with self.file_ops_lock:
+            self.current_files += len(linked)
+            self.deduplicated_files = len(linked) + len(deduplicated)
+            self.failed_files += len(self.linked_picons) - len(linked)
+            self.saved_bytes = saved_bytes
+        FileOps.finishFileOps(self)
+
+    def completionStatus(self):
+        status = _("Done") + ": " + str(self.downloaded_files) + " " + _("downloaded") + ", " + str(self.unchanged_files) + " " + _("unchanged") + ", " + str(self.failed_files) + " " + _("failed")
+        if self.skipped_files:
+            status += ", " + str(self.skipped_files) + " " + _("skipped (server unavailable)")
+        if self.missing_files:
+            status += ", " + str(self.missing_files) + " " + _("not in set")
+        if self.retries:
+            status += ", " + str(self.retries) + " " + _("retries")
+        if self.cached_files:
+            status += ", " + str(self.cached_files) + " " + _("from cache")
+        if self.deduplicated_files or self.saved_bytes:
+            status += ", " + str(self.deduplicated_files) + " " + _("linked") + ", " + formatBytes(self.saved_bytes) + " " + _("saved")
+        stats = self.getStats()
+        logger.info("stats: %s", stats)
+        return status + ". " + _("Latency") + " p50/p95/max: %d/%d/%d ms" % (stats["latency_p50"] * 1000, stats["latency_p95"] * 1000, stats["latency_max"] * 1000)
+
+    def start(self):
+        logger.debug("...")
+        self.status = _("Initializing") + " ..."
+        self.total_files = len(self.picons)
+        self.setExecutionSource(self.picons)
+        self.updateProgress()
+        # The first requests are started from the completion queue, after the caller has returned
+        if self.options.dedup:
+            self.completion_queue.put(self.startHashListDownload)
+        else:
+            self.completion_queue.put(self.startDownloads)
+
+    def startDownloads(self):
+        if self.options.use_archive:
+            self.startArchiveDownload()
+        else:
+            self.startFileOps()
+
+    def startHashListDownload(self):
+        logger.debug("...")
+        request = self.web_client.getContentAsync(urljoin(self.getSetUrl(), picon_hash_file))
+        request.addCallback(lambda content: self.hashListSuccess(content, request))
+        request.addErrback(lambda error: self.hashListError(error, request))
+        self.startRequest(request)
+
+    def hashListSuccess(self, content, request):
+        with self.file_ops_lock:
+            self.active_requests.discard(request)
+        hashes = parseHashList(content.decode("utf-8", "replace") if isinstance(content, bytes) else content)
+        logger.info("hashes: %s", len(hashes))
+        self.picon_hashes = hashes
+        self.setExecutionSource(self.iterOriginalPicons(self.execution_source, hashes))
+        self.startDownloads()
+
+    def iterOriginalPicons(self, picons, hashes):
+        """Yield only the first picon of each hash, the others are linked to it afterwards"""
+        originals = {}
+        for picon in picons:
+            digest = hashes.get(picon)
+            original = originals.setdefault(digest, picon) if digest else picon
+            if original == picon:
+                yield picon
+            else:
+                self.linked_picons[picon] = original
+
+    def hashListError(self, result, request):
+        # The hash list is optional, a set without one is downloaded without dedup
+        if isNotFound(result):
+            logger.info("no picon hash list")
+        elif not self.request_cancel:
+            logger.error("picon hash list: %s", result)
+        with self.file_ops_lock:
+            self.active_requests.discard(request)
+        self.startDownloads()
+
+    def startArchiveDownload(self):
+        logger.debug("...")
+        self.status = _("Downloading picon archive") + " ..."
+        self.updateProgress()
+        # The archive is tried on all mirrors, the best one first
+        mirrors = self.mirrors.getRanked() if self.mirrors else [None]
+        urls = [urljoin(self.getSetUrl(mirror), archive_file) for mirror in mirrors for archive_file in picon_archive_files]
+        # A streamed picon list is not read into memory to select the archive members
+        members = self.picons.getMemberFilter() if isinstance(self.picons, PiconList) else set(self.picons)
+        downloader = self.web_client.downloadArchiveAsync(urls, str(self.picon_dir), members)
+        # The progback runs on the worker thread, the extracted picons are accounted for on the completion queue
+        downloader.addProgback(lambda picon: self.completion_queue.put(self.archiveProgress, picon))
+        downloader.addCallback(lambda extracted: self.archiveSuccess(extracted, downloader))
+        downloader.addErrback(lambda error: self.archiveError(error, downloader))
+        self.startRequest(downloader)
+
+    def archiveProgress(self, picon):
+        self.file_name = picon
+        try:
+            self.stats.addBytes(os.path.getsize(os.path.join(self.picon_dir, picon)))
+        except OSError as e:
+            logger.error("picon: %s, exception: %s", picon, e)
+        self.archive_picons.add(picon)
+        self.updateMetadata(picon, {})
+        with self.file_ops_lock:
+            self.current_files += 1
+            self.downloaded_files += 1
+        self.updateProgress()
+
+    def archiveSuccess(self, extracted, downloader):
+        logger.info("extracted: %s", len(extracted))
+        with self.file_ops_lock:
+            self.active_requests.discard(downloader)
+        self.startRemainingFileOps()
+
+    def archiveError(self, result, downloader):
+        logger.info("falling back to single picon downloads, result: %s", result)
+        with self.file_ops_lock:
+            self.active_requests.discard(downloader)
+        self.startRemainingFileOps()
+
+    def startRemainingFileOps(self):
+        # Picons that are not in the archive are downloaded one by one
+        self.setExecutionSource(picon for picon in self.execution_source if picon not in self.archive_picons)
+        self.startFileOps()
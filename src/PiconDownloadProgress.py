@@ -3,75 +3,84 @@
 # License: GNU General Public License v3.0 (see LICENSE file for details)
 
 
-import os
-from urllib.parse import urljoin
-
-from .WebRequestsAsync import WebRequestsAsync
+import threading
+from Components.config import config
+import Screens.Standby
 from .Debug import logger
 from .__init__ import _
 from .FileProgress import FileProgress
-from .DelayTimer import DelayTimer
 from .FileUtils import readFile
+from .PiconDownload import PiconDownload, DownloadOptions
+from .CompletionQueue import CompletionQueue
 from .SkinUtils import getSkinPath
 
 
+# Only one picon download runs at a time, the interactive one or a scheduled sync
+download_lock = threading.Lock()
+
+
+def getBandwidthLimit():
+    """Return the configured bandwidth limit in bytes per second, 0 for unlimited"""
+    if config.plugins.piconcockpit.unlimited_in_standby.value and Screens.Standby.inStandby:
+        return 0
+    return int(config.plugins.piconcockpit.bandwidth_limit.value) * 1024
+
+
+def getDownloadOptions():
+    """Return the download options of the plugin config"""
+    return DownloadOptions(
+        max_downloads=int(config.plugins.piconcockpit.max_downloads.value),
+        engine=config.plugins.piconcockpit.download_engine.value,
+        bandwidth_limit=getBandwidthLimit,
+        use_archive=config.plugins.piconcockpit.use_archive.value,
+        dedup=config.plugins.piconcockpit.dedup_picons.value,
+        spool_size=int(config.plugins.piconcockpit.spool_size.value) * 1024 * 1024 if config.plugins.piconcockpit.spool_downloads.value else 0,
+        cache_directory=config.plugins.piconcockpit.cache_directory.value,
+        cache_size=int(config.plugins.piconcockpit.cache_size.value) * 1024 * 1024,
+    )
+
+
 class PiconDownloadProgress(FileProgress):
     skin = readFile(getSkinPath("PiconDownloadProgress.xml"))
 
-    def __init__(self, session, picon_set_url, picons, picon_dir):
+    def __init__(self, session, picon_set_url, picons, picon_dir, manifest=None, mirrors=None):
         logger.debug("...")
-        self.picon_set_url = picon_set_url
-        self.picons = picons
-        self.picon_dir = picon_dir
-        # Initialize WebRequestsAsync client
-        self.web_client = WebRequestsAsync()
-        FileProgress.__init__(self, session)
+        # Completions of the download engine are handled on the main loop
+        self.completion_queue = CompletionQueue()
+        self.download = PiconDownload(picon_set_url, picons, picon_dir, getDownloadOptions(), self.completion_queue, manifest, mirrors)
+        self.locked = False
+        FileProgress.__init__(self, session, self.download)
         self.setTitle(_("Picon Download") + " ...")
-        self.execution_list = []
         self.onShow.append(self.onDialogShow)
+        self.onClose.append(self.__onClose)
 
     def onDialogShow(self):
         logger.debug("...")
-        self.execPiconDownloadProgress()
+        self.onShow.remove(self.onDialogShow)
+        self.locked = download_lock.acquire(False)
+        if self.locked:
+            self.download.start()
+        else:
+            # A scheduled sync started while the download was being confirmed
+            logger.info("scheduled sync is running")
+            self.download.cancel()
+            self.download.status = _("A scheduled picon sync is running, please try again later.")
+            self.flushProgress()
 
-    def doFileOp(self, entry):
-        picon = entry
-        self.file_name = picon
-        self.status = _("Please wait") + " ..."
-        self.updateProgress()
-        url = None
-        try:
-            # Proper URL construction for picon download
-            picon_set_url = str(self.picon_set_url)
-            if not picon_set_url.endswith('/'):
-                picon_set_url += '/'
-            url = urljoin(picon_set_url, str(picon))
-
-            download_file = os.path.join(str(self.picon_dir), str(picon))
-
-            logger.debug("url: %s, download_file: %s", url, download_file)
-
-            # Use WebRequestsAsync instead of twisted downloadPage
-            downloader = self.web_client.downloadFileAsync(url, download_file)
-            downloader.addCallback(self.downloadSuccess)
-            downloader.addErrback(lambda error: self.downloadError(error, url))
-            downloader.start()
-        except Exception as e:
-            logger.error("Error in downloadFile: %s", e)
-            self.downloadError(str(e), url if url else "unknown")
-
-    def downloadSuccess(self, _result=None):
-        # logger.info("...")
-        self.nextFileOp()
+    def __onClose(self):
+        logger.debug("...")
+        self.download.close()
+        self.completion_queue.close()
+        if self.locked:
+            download_lock.release()
 
-    def downloadError(self, result, url):
-        logger.info("url: %s, result: %s", url, result)
-        self.nextFileOp()
+    def finishFileOps(self):
+        self.saveThroughput()
+        FileProgress.finishFileOps(self)
 
-    def execPiconDownloadProgress(self):
-        logger.debug("...")
-        self.status = _("Initializing") + " ..."
-        self.updateProgress()
-        self.execution_list = self.picons
-        self.total_files = len(self.execution_list)
-        DelayTimer(10, self.nextFileOp)
+    def saveThroughput(self):
+        """Remember the average throughput of a download that transferred enough bytes to be meaningful"""
+        stats = self.download.getStats()
+        if stats["bytes"] >= 256 * 1024 and stats["average_throughput"]:
+            config.plugins.piconcockpit.last_throughput.value = int(stats["average_throughput"] / 1024) or 1
+            config.plugins.piconcockpit.last_throughput.save()
@@ -0,0 +1,82 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+from .Debug import logger
+from .FileUtils import iterFileLines, deleteFile
+from .PiconDedup import hashFile
+from .PiconSync import scanPiconDir
+
+
+manifest_file = "zz_picon_manifest.txt"
+
+
+def parseManifest(path):
+    """Read a picon set manifest of "<picon>;<size>;<sha1>" lines into a dict of picon: (size, hash)"""
+    manifest = {}
+    for line in iterFileLines(path):
+        fields = line.split(";")
+        if len(fields) >= 3 and fields[1].strip().isdigit():
+            manifest[fields[0].strip()] = (int(fields[1]), fields[2].strip().lower())
+    logger.debug("path: %s, entries: %s", path, len(manifest))
+    return manifest
+
+
+def buildLocalManifest(picon_dir, metadata):
+    """Hash the picons in picon_dir that have no valid hash in the metadata, this is only slow on the first sync"""
+    hashed = 0
+    for picon, (size, mtime) in scanPiconDir(picon_dir).items():
+        if picon.endswith(".png") and metadata.getHash(picon, size, mtime) is None:
+            try:
+                content_hash = hashFile(os.path.join(picon_dir, picon))
+                entry = metadata.getEntry(picon)
+                if not entry or entry.get("size") != size or entry.get("mtime") != mtime:
+                    # The picon changed on disk, the validators of its last download are void
+                    metadata.update(picon, {})
+                metadata.setHash(picon, content_hash)
+                hashed += 1
+            except OSError as e:
+                logger.error("picon: %s, exception: %s", picon, e)
+    logger.info("hashed: %s", hashed)
+    return hashed
+
+
+def loadManifest(picon_dir, metadata):
+    """Parse the downloaded manifest of picon_dir and hash the local picons it is compared with"""
+    manifest = parseManifest(os.path.join(picon_dir, manifest_file))
+    if manifest:
+        buildLocalManifest(picon_dir, metadata)
+    return manifest
+
+
+def getManifestFilter(manifest, picon_dir, metadata):
+    """Return a filter that accepts the picons that are missing in picon_dir or whose hash differs from the manifest"""
+    local_picons = scanPiconDir(picon_dir)
+
+    def isChanged(picon):
+        local = local_picons.get(picon)
+        remote = manifest.get(picon)
+        if local is None or remote is None:
+            return True
+        return metadata.getHash(picon, *local) != remote[1]
+    return isChanged
+
+
+def getManifestSource(picon_set_url):
+    """Return the key that marks the picons written by a manifest sync of a picon set"""
+    return str(picon_set_url).rstrip("/")
+
+
+def deleteRemovedPicons(manifest, picon_dir, metadata, picon_set_url):
+    """
+    Delete the picons that an earlier manifest sync of the picon set wrote and that are no longer in its manifest
+    Picons of other sets and picons placed by the user are never deleted, returns the deleted picons
+    """
+    removed_picons = [picon for picon in metadata.getSourcePicons(getManifestSource(picon_set_url)) if picon not in manifest]
+    for picon in removed_picons:
+        deleteFile(os.path.join(picon_dir, picon))
+        metadata.remove(picon)
+    logger.info("removed_picons: %s", len(removed_picons))
+    return removed_picons
@@ -0,0 +1,142 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import json
+import threading
+from .Debug import logger
+from .FileUtils import readFile, writeFile
+
+
+metadata_file = ".piconcockpit_metadata.json"
+
+
+class PiconMetadata():
+    """Persistent store of the HTTP validators of the picons in a picon directory"""
+
+    def __init__(self, picon_dir):
+        self.picon_dir = picon_dir
+        self.path = os.path.join(picon_dir, metadata_file)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        data = readFile(self.path)
+        try:
+            self.entries = json.loads(data) if data else {}
+        except ValueError as e:
+            logger.error("path: %s, exception: %s", self.path, e)
+            self.entries = {}
+        logger.debug("entries: %s", len(self.entries))
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            data = json.dumps(self.entries, separators=(",", ":"))
+            self.changed = False
+        tmp_path = self.path + ".tmp"
+        writeFile(tmp_path, data)
+        try:
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error("path: %s, exception: %s", self.path, e)
+        logger.debug("entries: %s", len(self.entries))
+
+    def getEntry(self, picon):
+        with self.lock:
+            return self.entries.get(picon)
+
+    def getRequestHeaders(self, picon):
+        """Return the conditional request headers for a picon that is already on disk"""
+        headers = {}
+        entry = self.getEntry(picon)
+        if entry and os.path.isfile(os.path.join(self.picon_dir, picon)):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, picon, response_headers):
+        """Remember the validators of a successful response and the stat of the written file"""
+        entry = {
+            "etag": response_headers.get("etag", ""),
+            "last_modified": response_headers.get("last-modified", ""),
+            "content_length": int(response_headers.get("content-length", 0) or 0),
+        }
+        try:
+            stat = os.stat(os.path.join(self.picon_dir, picon))
+            entry["size"] = stat.st_size
+            entry["mtime"] = int(stat.st_mtime)
+        except OSError as e:
+            logger.error("picon: %s, exception: %s", picon, e)
+        with self.lock:
+            self.entries[picon] = entry
+            self.changed = True
+
+    def updateStat(self, picon, original):
+        """Record a picon that was linked to an original picon with the validators of the original"""
+        entry = self.getEntry(original)
+        if entry:
+            self.update(picon, {"etag": entry["etag"], "last-modified": entry["last_modified"], "content-length": entry["content_length"]})
+            if entry.get("hash"):
+                self.setHash(picon, entry["hash"])
+
+    def getHash(self, picon, size, mtime):
+        """Return the content hash of a picon, or None if it is unknown or the file changed since it was hashed"""
+        entry = self.getEntry(picon)
+        if entry and entry.get("hash") and entry.get("size") == size and entry.get("mtime") == mtime:
+            return entry["hash"]
+        return None
+
+    def setHash(self, picon, content_hash):
+        if self.getEntry(picon) is None:
+            self.update(picon, {})
+        with self.lock:
+            self.entries[picon]["hash"] = content_hash
+            self.changed = True
+
+    def setStatHash(self, picon, size, mtime, content_hash):
+        """Remember the content hash of a picon whose entry matches the stat it was hashed with"""
+        with self.lock:
+            entry = self.entries.get(picon)
+            if entry and entry.get("size") == size and entry.get("mtime") == mtime:
+                entry["hash"] = content_hash
+                self.changed = True
+
+    def updateLink(self, picon, content_hash):
+        """Record the stat of a picon that was replaced by a link to an identical picon, its validators stay valid"""
+        try:
+            stat = os.stat(os.path.join(self.picon_dir, picon))
+        except OSError as e:
+            logger.error("picon: %s, exception: %s", picon, e)
+            return
+        with self.lock:
+            entry = self.entries.get(picon)
+            if entry is not None:
+                entry["size"] = stat.st_size
+                entry["mtime"] = int(stat.st_mtime)
+                entry["hash"] = content_hash
+                self.changed = True
+
+    def setSource(self, picon, source):
+        """Mark a picon as written by a manifest sync of the picon set source, the mark is dropped when the entry is updated"""
+        with self.lock:
+            entry = self.entries.get(picon)
+            if entry is not None:
+                entry["source"] = source
+                self.changed = True
+
+    def getSourcePicons(self, source):
+        with self.lock:
+            return [picon for picon, entry in self.entries.items() if entry.get("source") == source]
+
+    def remove(self, picon):
+        with self.lock:
+            if self.entries.pop(picon, None) is not None:
+                self.changed = True
@@ -0,0 +1,157 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import time
+import threading
+from urllib.parse import urljoin
+from .Debug import logger
+
+
+def normalizeServerUrl(url):
+    url = str(url).strip()
+    if not url.startswith(("http://", "https://")):
+        url = "http://" + url
+    if not url.endswith("/"):
+        url += "/"
+    return url
+
+
+def parseMirrorList(primary, mirrors):
+    """Return the primary server url followed by the mirror urls of a comma separated list, without duplicates"""
+    urls = [normalizeServerUrl(primary)]
+    for url in mirrors.replace(";", ",").split(","):
+        if url.strip():
+            url = normalizeServerUrl(url)
+            if url not in urls:
+                urls.append(url)
+    return urls
+
+
+class Mirror():
+
+    def __init__(self, url, file_time):
+        self.url = url
+        self.file_time = file_time
+        self.samples = 0
+        self.active = 0
+        self.failures = 0
+        self.demoted_until = 0
+
+    def isHealthy(self, now):
+        return self.demoted_until <= now
+
+    def getScore(self):
+        # expected time until one more download on this mirror completes
+        return (self.active + 1) * self.file_time
+
+    def __repr__(self):
+        return "%s (%.3fs, active: %s, failures: %s)" % (self.url, self.file_time, self.active, self.failures)
+
+
+class MirrorSet():
+    """
+    Mirrors of a picon server, ranked by probed latency and throughput and by the observed
+    time per picon download. Downloads are spread across the healthy mirrors, so that each
+    new download goes to the mirror expected to finish it first. A mirror that fails
+    repeatedly or becomes much slower than the best one is demoted for demote_time seconds
+    """
+
+    def __init__(self, urls, demote_time=60, max_failures=3, slow_factor=4, file_size=20 * 1024):
+        self.mirrors = [Mirror(url, 0.5) for url in urls]
+        self.primary = urls[0]
+        self.demote_time = demote_time
+        self.max_failures = max_failures
+        self.slow_factor = slow_factor
+        self.file_size = file_size
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.callback = None
+
+    def __len__(self):
+        return len(self.mirrors)
+
+    def probe(self, web_client, path, callback=None):
+        """GET the first file_size bytes of path from all mirrors in parallel and rank the mirrors by latency and throughput"""
+        self.callback = callback
+        self.pending = len(self.mirrors)
+        headers = {"Range": "bytes=0-%d" % (self.file_size - 1)}
+        for mirror in self.mirrors:
+            request = web_client.getContentAsync(urljoin(mirror.url, path), headers=headers, max_size=self.file_size)
+            request.addCallback(lambda content, mirror=mirror, request=request: self.probeSuccess(mirror, request, content))
+            request.addErrback(lambda error, mirror=mirror: self.probeError(mirror, error))
+            request.start()
+
+    def probeSuccess(self, mirror, request, content):
+        throughput = len(content) / max(request.elapsed - request.latency, 0.001)
+        with self.lock:
+            mirror.file_time = request.latency + self.file_size / max(throughput, 1)
+        logger.info("mirror: %s, latency: %.3f, throughput: %d", mirror.url, request.latency, throughput)
+        self.probeDone()
+
+    def probeError(self, mirror, error):
+        logger.info("mirror: %s, error: %s", mirror.url, error)
+        with self.lock:
+            # an unreachable mirror is ranked last
+            mirror.file_time = max(mirror.file_time, 10.0)
+        self.recordFailure(mirror)
+        self.probeDone()
+
+    def probeDone(self):
+        self.pending -= 1
+        if not self.pending:
+            logger.info("ranked: %s", self.getRanked())
+            if self.callback:
+                self.callback(self)
+
+    def getRanked(self):
+        """Return the healthy mirrors, fastest first, followed by the demoted ones"""
+        now = time.time()
+        with self.lock:
+            return sorted(self.mirrors, key=lambda mirror: (not mirror.isHealthy(now), mirror.file_time))
+
+    def getUrl(self, mirror, url):
+        """Map a url on the primary server to the same path on mirror"""
+        if url.startswith(self.primary):
+            return mirror.url + url[len(self.primary):]
+        return url
+
+    def acquire(self, exclude=()):
+        """Pick the mirror for the next download, or None if all mirrors are excluded"""
+        now = time.time()
+        with self.lock:
+            candidates = [mirror for mirror in self.mirrors if mirror not in exclude]
+            if not candidates:
+                return None
+            healthy = [mirror for mirror in candidates if mirror.isHealthy(now)] or candidates
+            mirror = min(healthy, key=lambda mirror: mirror.getScore())
+            mirror.active += 1
+            return mirror
+
+    def release(self, mirror, elapsed=None):
+        """Release a download slot of mirror, elapsed is the time of a successful download"""
+        with self.lock:
+            mirror.active -= 1
+            if elapsed is None:
+                return
+            mirror.failures = 0
+            mirror.samples += 1
+            mirror.file_time = mirror.file_time * 0.8 + elapsed * 0.2
+            best = min((other.file_time for other in self.mirrors if other.isHealthy(time.time())), default=mirror.file_time)
+            if mirror.samples >= 3 and mirror.file_time > best * self.slow_factor:
+                self.demote(mirror, "slow")
+
+    def recordFailure(self, mirror):
+        with self.lock:
+            mirror.failures += 1
+            if mirror.failures >= self.max_failures:
+                self.demote(mirror, "failing")
+
+    def demote(self, mirror, reason):
+        # called with the lock held
+        if len(self.mirrors) > 1 and mirror.isHealthy(time.time()):
+            logger.info("mirror: %s, reason: %s", mirror, reason)
+            mirror.demoted_until = time.time() + self.demote_time
+            mirror.failures = 0
+            mirror.samples = 0
@@ -0,0 +1,112 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+from urllib.parse import urljoin
+from .Debug import logger
+from .PiconSync import scanPiconDir
+
+
+def getFreeSpace(path):
+    try:
+        stat = os.statvfs(path)
+        return stat.f_bavail * stat.f_frsize
+    except OSError as e:
+        logger.error("path: %s, exception: %s", path, e)
+        return None
+
+
+class PiconPreflight():
+    """
+    Estimate the bytes a picon download writes before it starts
+    Sizes come from the size column of the picon list, picons without size are estimated
+    from HEAD requests for a sample of them. The bytes needed are the estimate minus the
+    picons that are replaced, they are compared with the free space in the picon directory
+    Reading the picon list and the picon directory runs on the request engine, the callback
+    runs on the thread that drains the completion queue of the web client
+    """
+
+    def __init__(self, web_client, picon_set_url, picons, picon_dir, throughput=0):
+        self.web_client = web_client
+        self.picon_set_url = picon_set_url if picon_set_url.endswith("/") else picon_set_url + "/"
+        self.picons = picons
+        self.picon_dir = picon_dir
+        self.throughput = throughput
+        self.callback = None
+        self.pending = 0
+        self.sample_sizes = []
+
+    def start(self, callback):
+        self.callback = callback
+        self.web_client.engine.submit(self.scan)
+
+    def scan(self):
+        try:
+            self.picons.scan()
+        except Exception as e:
+            logger.error("exception: %s", e)
+        finally:
+            self.web_client.completion_queue.put(self.requestSample)
+
+    def requestSample(self):
+        count = self.picons.count
+        sample = self.picons.sample if self.picons.sized_count < count else []
+        logger.debug("count: %s, sized_count: %s, sample: %s", count, self.picons.sized_count, len(sample))
+        if not sample:
+            self.finish()
+            return
+        self.pending = len(sample)
+        for picon in sample:
+            request = self.web_client.getHeadersAsync(urljoin(self.picon_set_url, picon))
+            request.addCallback(self.headSuccess)
+            request.addErrback(self.headError)
+            request.start()
+
+    def headSuccess(self, headers):
+        size = headers.get("content-length")
+        if size and size.isdigit():
+            self.sample_sizes.append(int(size))
+        self.headDone()
+
+    def headError(self, error):
+        logger.info("error: %s", error)
+        self.headDone()
+
+    def headDone(self):
+        self.pending -= 1
+        if not self.pending:
+            self.finish()
+
+    def getEstimate(self):
+        """Return a dict of count, bytes, needed, free and duration, bytes, needed and duration are None if unknown"""
+        count = len(self.picons)
+        unsized_count = count - self.picons.sized_count
+        total_bytes = self.picons.listed_size
+        if unsized_count:
+            if self.sample_sizes:
+                total_bytes += unsized_count * sum(self.sample_sizes) // len(self.sample_sizes)
+            else:
+                total_bytes = None
+        needed = None
+        if total_bytes is not None:
+            local_picons = scanPiconDir(self.picon_dir)
+            replaced_bytes = sum(local_picons[picon][0] for picon in self.picons if picon in local_picons)
+            needed = max(0, total_bytes - replaced_bytes)
+        duration = total_bytes / self.throughput if total_bytes is not None and self.throughput else None
+        return {"count": count, "bytes": total_bytes, "needed": needed, "free": getFreeSpace(self.picon_dir), "duration": duration}
+
+    def finish(self):
+        self.web_client.engine.submit(self.estimate)
+
+    def estimate(self):
+        estimate = {"count": self.picons.count, "bytes": None, "needed": None, "free": None, "duration": None}
+        try:
+            estimate = self.getEstimate()
+        except Exception as e:
+            logger.error("exception: %s", e)
+        finally:
+            # The callback always hears back, an estimate that failed is unknown
+            logger.info("estimate: %s", estimate)
+            self.web_client.completion_queue.put(self.callback, estimate)
@@ -0,0 +1,184 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import time
+import threading
+from enigma import eTimer
+from Components.config import config
+import Screens.Standby
+from .Debug import logger
+from .DelayTimer import DelayTimer
+from .WebRequestsAsync import WebRequestsAsync
+from .PiconDownloadProgress import getDownloadOptions, download_lock
+from .sync import CompletionLoop, parseArguments, sync, logMessage, EXIT_OK, EXIT_FAILED, EXIT_CANCELLED
+
+
+def getScheduledBandwidthLimit():
+    """Return the bandwidth budget of a scheduled sync in bytes per second, 0 for unlimited"""
+    if config.plugins.piconcockpit.unlimited_in_standby.value and Screens.Standby.inStandby:
+        return 0
+    return int(config.plugins.piconcockpit.schedule_bandwidth_limit.value) * 1024
+
+
+class SyncJob():
+    """
+    Runs the command line sync in a worker thread, its completions are handled on that thread
+    The job holds the download lock, which it releases when the sync has finished
+    """
+
+    def __init__(self, args, options):
+        self.args = args
+        self.options = options
+        self.loop = CompletionLoop()
+        self.exit_code = None
+        self.thread = threading.Thread(target=self.run, name="PiconScheduler")
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        web_client = WebRequestsAsync(engine=self.options.engine, completion_queue=self.loop)
+        try:
+            self.exit_code = sync(self.args, web_client, self.loop, self.options, logMessage)
+        except KeyboardInterrupt:
+            self.exit_code = EXIT_CANCELLED
+        except Exception as e:
+            logger.error("exception: %s", e)
+            self.exit_code = EXIT_FAILED
+        finally:
+            web_client.close()
+            self.loop.close()
+            download_lock.release()
+
+    def isAlive(self):
+        return self.thread.is_alive()
+
+    def cancel(self):
+        self.loop.interrupt()
+
+
+class PiconScheduler():
+    """
+    Re-syncs the last picon set in the background, daily at the scheduled hour and when the box enters standby
+    The sync runs with no screen open, only picons that are missing or changed are downloaded, and the
+    parallel downloads and the bandwidth are limited to the budget of the schedule outside of standby
+    Only a sync that succeeded counts as the last scheduled sync, a failed one is retried after retry_interval
+    """
+
+    def __init__(self, session, check_interval=60, standby_delay=120, standby_interval=6 * 3600, retry_interval=1800):
+        self.session = session
+        self.standby_delay = standby_delay
+        self.standby_interval = standby_interval
+        self.retry_interval = retry_interval
+        self.last_attempt = 0
+        self.job = None
+        self.standby_timer = None
+        self.timer = eTimer()
+        self.timer.callback.append(self.check)
+        self.timer.start(check_interval * 1000, False)
+        config.misc.standbyCounter.addNotifier(self.enterStandby, initial_call=False)
+
+    def stop(self):
+        logger.info("...")
+        self.timer.stop()
+        if self.check in self.timer.callback:
+            self.timer.callback.remove(self.check)
+        config.misc.standbyCounter.removeNotifier(self.enterStandby)
+        self.leaveStandby()
+        standby = Screens.Standby.inStandby
+        if standby and self.leaveStandby in standby.onClose:
+            standby.onClose.remove(self.leaveStandby)
+        if self.job and self.job.isAlive():
+            self.job.cancel()
+
+    def check(self):
+        self.checkJob()
+        if config.plugins.piconcockpit.schedule_mode.value not in ("daily", "both"):
+            return
+        now = time.localtime()
+        last_sync = time.localtime(config.plugins.piconcockpit.last_scheduled_sync.value)
+        if now.tm_hour == int(config.plugins.piconcockpit.schedule_hour.value) and last_sync[:3] != now[:3]:
+            self.startSync("daily")
+
+    def enterStandby(self, _element):
+        if config.plugins.piconcockpit.schedule_mode.value not in ("standby", "both"):
+            return
+        logger.info("...")
+        standby = Screens.Standby.inStandby
+        if standby and self.leaveStandby not in standby.onClose:
+            standby.onClose.append(self.leaveStandby)
+        # The sync starts once the box has settled in standby
+        self.standby_timer = DelayTimer(self.standby_delay * 1000, self.standbySync)
+
+    def leaveStandby(self):
+        logger.info("...")
+        if self.standby_timer:
+            self.standby_timer.stop()
+            self.standby_timer = None
+
+    def standbySync(self):
+        self.standby_timer = None
+        if not self.checkJob() and time.time() - config.plugins.piconcockpit.last_scheduled_sync.value >= self.standby_interval:
+            self.startSync("standby")
+
+    def getSyncArguments(self):
+        # Scheduled syncs are incremental, a full sync only downloads the missing or changed picons
+        sync_mode = config.plugins.piconcockpit.sync_mode.value
+        argv = [
+            "--set", config.plugins.piconcockpit.last_picon_set.value,
+            "--dir", config.plugins.piconcockpit.picon_directory.value,
+            "--mode", "all" if config.plugins.piconcockpit.all_picons.value else "bouquets",
+            "--sync", sync_mode if sync_mode != "full" else "changed",
+            "--server", config.plugins.piconcockpit.picon_server.value,
+            "--mirrors", config.plugins.piconcockpit.mirrors.value,
+            "--quiet",
+        ]
+        if config.plugins.piconcockpit.delete_removed.value:
+            argv.append("--delete-removed")
+        return parseArguments(argv)
+
+    def getSyncOptions(self):
+        options = getDownloadOptions()
+        options.max_downloads = min(options.max_downloads, int(config.plugins.piconcockpit.schedule_max_downloads.value))
+        options.bandwidth_limit = getScheduledBandwidthLimit
+        return options
+
+    def startSync(self, trigger):
+        if self.checkJob():
+            logger.info("sync still running, trigger: %s", trigger)
+            return
+        if not config.plugins.piconcockpit.last_picon_set.value:
+            logger.info("no picon set selected yet, trigger: %s", trigger)
+            return
+        if time.time() - self.last_attempt < self.retry_interval:
+            logger.info("last sync failed, retry later, trigger: %s", trigger)
+            return
+        args, options = self.getSyncArguments(), self.getSyncOptions()
+        if not download_lock.acquire(False):
+            # A daily sync is tried again with the next check
+            logger.info("picon download running, trigger: %s", trigger)
+            return
+        logger.info("trigger: %s, picon_set: %s", trigger, config.plugins.piconcockpit.last_picon_set.value)
+        self.last_attempt = time.time()
+        self.job = SyncJob(args, options)
+        self.job.start()
+
+    def checkJob(self):
+        """Return True while a sync job runs, a job that has finished is handled first"""
+        if self.job and not self.job.isAlive():
+            self.jobFinished()
+        return self.job is not None
+
+    def jobFinished(self):
+        if self.job.exit_code == EXIT_OK:
+            logger.info("picons synced")
+            # The next sync is due one day or one standby interval after this one
+            config.plugins.piconcockpit.last_scheduled_sync.value = int(time.time())
+            config.plugins.piconcockpit.last_scheduled_sync.save()
+            self.last_attempt = 0
+        else:
+            logger.error("exit_code: %s", self.job.exit_code)
+        self.job = None
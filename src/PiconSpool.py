@@ -0,0 +1,92 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import shutil
+import tempfile
+import threading
+from .Debug import logger
+from .FileUtils import deleteFile, deleteDirectory, syncDirectory, getFileSystemType
+
+
+spool_root = "/tmp"
+ram_file_systems = ["tmpfs", "ramfs"]
+
+
+def isRamDirectory(path):
+    return getFileSystemType(path) in ram_file_systems
+
+
+class PiconSpool():
+    """
+    RAM backed staging directory for picon downloads
+    Picons are downloaded into the spool and committed to the picon directory in batches,
+    so the flash sees one large write per picon and one directory sync per batch
+    """
+
+    def __init__(self, picon_dir, max_size=8 * 1024 * 1024, batch_size=100, root=spool_root):
+        if not isRamDirectory(root):
+            raise OSError("spool directory is not in RAM: %s" % root)
+        self.picon_dir = picon_dir
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.spool_dir = tempfile.mkdtemp(prefix="piconcockpit_", dir=root)
+        self.lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.pending = []
+        self.pending_size = 0
+        self.closed = False
+        logger.debug("spool_dir: %s, max_size: %s", self.spool_dir, max_size)
+
+    def getPath(self, picon):
+        return os.path.join(self.spool_dir, picon)
+
+    def add(self, picon, response_headers):
+        """Queue a downloaded picon for the next commit, returns True if the batch should be committed now"""
+        try:
+            size = os.path.getsize(self.getPath(picon))
+        except OSError as e:
+            logger.error("picon: %s, exception: %s", picon, e)
+            size = 0
+        with self.lock:
+            self.pending.append((picon, response_headers))
+            self.pending_size += size
+            return self.pending_size >= self.max_size or len(self.pending) >= self.batch_size
+
+    def takeBatch(self):
+        with self.lock:
+            batch = self.pending
+            self.pending = []
+            self.pending_size = 0
+        return batch
+
+    def commit(self, batch):
+        """Move a batch of spooled picons into the picon directory, returns the committed entries and the failed picons"""
+        committed = []
+        failed = []
+        with self.commit_lock:
+            if self.closed:
+                return committed, [picon for picon, _response_headers in batch]
+            for picon, response_headers in batch:
+                path = os.path.join(self.picon_dir, picon)
+                tmp_path = path + ".spool"
+                try:
+                    shutil.copyfile(self.getPath(picon), tmp_path)
+                    os.replace(tmp_path, path)
+                    committed.append((picon, response_headers))
+                except OSError as e:
+                    logger.error("picon: %s, exception: %s", picon, e)
+                    deleteFile(tmp_path)
+                    failed.append(picon)
+                deleteFile(self.getPath(picon))
+            syncDirectory(self.picon_dir)
+        logger.debug("committed: %s, failed: %s", len(committed), len(failed))
+        return committed, failed
+
+    def close(self):
+        # Waits for a commit in progress, so no picon is lost with the spool directory
+        with self.commit_lock:
+            self.closed = True
+        deleteDirectory(self.spool_dir)
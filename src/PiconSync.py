@@ -0,0 +1,156 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import os
+import random
+from .Debug import logger
+from .FileUtils import iterFileLines
+
+
+def getPiconName(service_ref):
+    """Return the picon file name of a service reference string, e.g. 1:0:19:283D:3FB:1:C00000:0:0:0: -> 1_0_19_283D_3FB_1_C00000_0_0_0.png"""
+    ref = service_ref.replace(":", "_")
+    return ref[:len(ref) - 1] + ".png"
+
+
+def parsePiconLine(line):
+    """Split a picon list line "<picon>[;<size>]" into picon and size, the size is None if the list has no size column"""
+    picon, _sep, size = line.partition(";")
+    picon = picon.strip()
+    size = size.strip()
+    return picon, int(size) if size.isdigit() else None
+
+
+def scanPiconDir(picon_dir):
+    """Return a dict of picon name: (size, mtime) for all files in picon_dir"""
+    picons = {}
+    try:
+        with os.scandir(picon_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    picons[entry.name] = (stat.st_size, int(stat.st_mtime))
+    except OSError as e:
+        logger.error("picon_dir: %s, exception: %s", picon_dir, e)
+    return picons
+
+
+def isPiconChanged(picon, local_picons, metadata):
+    """Check a picon against the directory scan and the metadata of its last download"""
+    local = local_picons.get(picon)
+    if local is None:
+        return True
+    entry = metadata.getEntry(picon)
+    if entry:
+        size, mtime = local
+        if "size" in entry and (size != entry["size"] or mtime != entry["mtime"]):
+            return True
+        if entry.get("content_length") and size != entry["content_length"]:
+            return True
+    return False
+
+
+def getChangedFilter(picon_dir, metadata):
+    """Return a filter that accepts the picons that are missing in picon_dir or changed since they were downloaded"""
+    local_picons = scanPiconDir(picon_dir)
+    logger.debug("local: %s", len(local_picons))
+    return lambda picon: isPiconChanged(picon, local_picons, metadata)
+
+
+class PiconList():
+    """
+    Picon list that is streamed line by line from a picon list file, or taken from a list
+    The priority picons that are in the list come first, picons rejected by picon_filter are left out
+    The scan also sums the sizes of the size column and samples the picons without size for a size estimate,
+    it is kept per filter, so going back to a filter that was scanned before does not read the list again
+    """
+
+    def __init__(self, source, priority_picons=None, picon_filter=None, sample_size=16):
+        self.source = source
+        self.priority_picons = priority_picons or []
+        self.picon_filter = picon_filter
+        self.sample_size = sample_size
+        self.first_picons = None
+        self.count = 0
+        self.listed_size = 0
+        self.sized_count = 0
+        self.sample = []
+        self.scans = {}
+
+    def setFilter(self, picon_filter):
+        self.picon_filter = picon_filter
+        self.first_picons = None
+        if picon_filter in self.scans:
+            self.count, self.listed_size, self.sized_count, self.sample, self.first_picons = self.scans[picon_filter]
+
+    def iterEntries(self):
+        if isinstance(self.source, str):
+            return (parsePiconLine(line) for line in iterFileLines(self.source))
+        return ((picon, None) for picon in self.source)
+
+    def iterSource(self):
+        return (picon for picon, _size in self.iterEntries())
+
+    def isWanted(self, picon):
+        return self.picon_filter is None or self.picon_filter(picon)
+
+    def scan(self):
+        """Count the wanted picons and find the listed priority picons in one pass, only sets of the priority picons are kept"""
+        if self.first_picons is None:
+            priority_picons = set(self.priority_picons)
+            listed_picons = set()
+            self.count = self.listed_size = self.sized_count = 0
+            self.sample = []
+            unsized_count = 0
+            for picon, size in self.iterEntries():
+                if self.isWanted(picon):
+                    if picon not in listed_picons:
+                        self.count += 1
+                        if size is not None:
+                            self.sized_count += 1
+                            self.listed_size += size
+                        else:
+                            # reservoir sampling keeps a uniform sample of the picons without size
+                            unsized_count += 1
+                            if len(self.sample) < self.sample_size:
+                                self.sample.append(picon)
+                            else:
+                                index = random.randrange(unsized_count)
+                                if index < self.sample_size:
+                                    self.sample[index] = picon
+                    if picon in priority_picons:
+                        listed_picons.add(picon)
+            self.first_picons = [picon for picon in dict.fromkeys(self.priority_picons) if picon in listed_picons]
+            self.scans[self.picon_filter] = (self.count, self.listed_size, self.sized_count, self.sample, self.first_picons)
+            logger.debug("count: %s, first_picons: %s", self.count, len(self.first_picons))
+        return self.first_picons
+
+    def getMemberFilter(self):
+        """
+        Return a filter for the members of a picon archive that accepts the wanted picons
+        A picon list file lists all picons of the set, so it is not read into memory for the filter
+        """
+        if isinstance(self.source, str):
+            return lambda picon: picon.endswith(".png") and self.isWanted(picon)
+        listed_picons = set(self.source)
+        return lambda picon: picon in listed_picons and self.isWanted(picon)
+
+    def __len__(self):
+        self.scan()
+        return self.count
+
+    def __bool__(self):
+        # A scanned list knows its count, otherwise the list is only read up to the first wanted picon
+        if self.first_picons is not None:
+            return self.count > 0
+        return any(self.isWanted(picon) for picon in self.iterSource())
+
+    def __iter__(self):
+        first_picons = self.scan()
+        yield from first_picons
+        first_picons = set(first_picons)
+        for picon in self.iterSource():
+            if picon not in first_picons and self.isWanted(picon):
+                yield picon
@@ -0,0 +1,61 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .Debug import logger
+
+
+class ThreadEngine():
+    """Runs every request in its own daemon thread"""
+
+    def submit(self, function):
+        thread = threading.Thread(target=function)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def close(self):
+        return
+
+
+class PoolEngine():
+    """Runs all requests on a bounded pool of worker threads, so the number of threads does not grow with the number of requests"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def getExecutor(self):
+        with self.lock:
+            if self.executor is None:
+                logger.debug("max_workers: %s", self.max_workers)
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="PiconCockpit")
+            return self.executor
+
+    @staticmethod
+    def run(function):
+        try:
+            function()
+        except Exception as e:
+            logger.error("exception: %s", e)
+
+    def submit(self, function):
+        return self.getExecutor().submit(self.run, function)
+
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            logger.debug("...")
+            # Requests that have not started yet are dropped, they would run against closed sessions
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def createEngine(name, max_workers=4):
+    if name == "pool":
+        return PoolEngine(max_workers)
+    return ThreadEngine()
@@ -3,35 +3,214 @@
 # License: GNU General Public License v3.0 (see LICENSE file for details)
 
 
+import os
 import json
+import lzma
+import random
+import shutil
+import tarfile
 import threading
+import time
+import zipfile
+import zlib
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from .WebRequests import WebRequests
 from .Debug import logger
+from .FileUtils import readFile, writeFile, deleteFile
+from .RequestEngine import createEngine
+
+
+decompressors = {
+    ".gz": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    ".xz": lzma.LZMADecompressor,
+}
+missing_variants = set()  # urls of pre-compressed variants the server does not offer
+
+
+class IncompleteDownloadError(IOError):
+    """The connection ended before Content-Length bytes were received"""
+
+
+class CircuitOpenError(IOError):
+    """Requests to a host fail fast because its circuit breaker is open"""
+
+
+def isRetryable(error):
+    """Check whether a request error is transient and worth a retry"""
+    if isinstance(error, requests.exceptions.HTTPError):
+        status_code = error.response.status_code if error.response is not None else 0
+        return status_code >= 500 or status_code == 429
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, IncompleteDownloadError))
+
+
+def isNotFound(error):
+    """Check whether a request error means that the file is not on the server"""
+    return isinstance(error, requests.exceptions.HTTPError) and error.response is not None and error.response.status_code in (404, 410)
+
+
+class CircuitBreaker():
+    """Opens after threshold consecutive transient failures of a host and lets a probe request through after cooldown seconds"""
+
+    def __init__(self, threshold=10, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.failures < self.threshold:
+                return True
+            if time.time() - self.opened_at >= self.cooldown:
+                # half open: let one probe through, a failure re-opens the breaker
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def recordSuccess(self):
+        with self.lock:
+            self.failures = 0
+
+    def recordFailure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures == self.threshold:
+                logger.info("circuit opened after %s failures", self.failures)
+                self.opened_at = time.time()
+
+
+class RateLimiter():
+    """
+    Token bucket limiting the bytes per second of all downloads of a client
+    rate is in bytes per second, 0 means unlimited; policy is an optional callable
+    that returns the effective rate and is evaluated on every consume
+    The bucket holds up to one second of tokens, so an idle link is never delayed
+    """
+
+    def __init__(self, rate=0, policy=None):
+        self.rate = rate
+        self.policy = policy
+        self.tokens = float(rate)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def getRate(self):
+        return self.policy() if self.policy else self.rate
+
+    def consume(self, size):
+        """Take size tokens and return the seconds the caller has to wait before it may continue"""
+        rate = self.getRate()
+        if not rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(float(rate), self.tokens + (now - self.last) * rate)
+            self.last = now
+            self.tokens -= size
+            return -self.tokens / rate if self.tokens < 0 else 0
 
 
 class WebRequestsAsync(WebRequests):
-    def __init__(self):
+    def __init__(self, pool_size=4, engine="threads", completion_queue=None):
         """
         Initialize the WebRequestsAsync class
+        pool_size is the number of keep-alive connections kept per host
+        engine selects how requests are run: "threads" starts a thread per request,
+        "pool" runs them on a bounded pool of pool_size worker threads
+        completion_queue, if given, runs callbacks and errbacks on the thread that drains it
+        instead of the worker thread; progbacks are always called on the worker thread
         """
         WebRequests.__init__(self)
-
-    def downloadFileAsync(self, url, path):
+        self.pool_size = pool_size
+        self.completion_queue = completion_queue
+        self.engine = createEngine(engine, pool_size)
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.breakers = {}
+        self.timeout = (10, 30)
+        self.retries = 3
+        self.backoff = 0.5
+        self.rate_limiter = RateLimiter()
+
+    def getPooledSession(self, url):
+        """
+        Return the long-lived session shared by all requests to the host of url
+        The session is created on first use and keeps its connections alive
+        """
+        parsed = urlparse(url)
+        host = (parsed.scheme, parsed.netloc)
+        with self.sessions_lock:
+            session = self.sessions.get(host)
+            if session is None:
+                logger.debug("host: %s://%s, pool_size: %s", parsed.scheme, parsed.netloc, self.pool_size)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[host] = session
+        return session
+
+    def getCircuitBreaker(self, url):
+        """Return the circuit breaker shared by all downloads from the host of url"""
+        host = urlparse(url).netloc
+        with self.sessions_lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker()
+        return breaker
+
+    def close(self):
+        """Close all pooled sessions and their connections and stop the engine"""
+        self.engine.close()
+        with self.sessions_lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        logger.debug("sessions: %s", len(sessions))
+        for session in sessions:
+            session.close()
+
+    def downloadFileAsync(self, url, path, headers=None, resume=False, variants=None):
         """
         Asynchronous version of downloadFile that supports callbacks
+        headers are extra request headers, e.g. conditional request validators
+        resume keeps an interrupted download and continues it with a Range request
+        variants are suffixes of pre-compressed copies of url (".xz", ".gz") that are tried first
+        and decompressed while streaming; the transfer itself negotiates gzip/deflate
+        The file is written to a .part sibling and renamed into place when it is complete
         Returns a Downloader object with addCallback, addErrback, and addProgback methods
         """
         logger.info("url: %s, path: %s", url, path)
-        return Downloader(self, url, path)
+        return Downloader(self, url, path, headers, resume, variants)
 
-    def getContentAsync(self, url, params=None):
+    def downloadArchiveAsync(self, urls, dest_dir, members=None):
+        """
+        Download the first available archive of urls (tar, tar.gz or zip) and
+        extract the files named in members, or accepted by members if it is a function, or all files, flat into dest_dir
+        Tar archives are extracted while streaming, zip archives are spooled to disk first
+        Returns an ArchiveDownloader object with addCallback, addErrback, and addProgback methods
+        """
+        logger.info("urls: %s, dest_dir: %s", urls, dest_dir)
+        return ArchiveDownloader(self, urls, dest_dir, members)
+
+    def getContentAsync(self, url, params=None, headers=None, max_size=0):
         """
         Asynchronous version of getContent that supports callbacks
+        headers are extra request headers, max_size limits the content that is read, 0 reads all of it
         Returns a ContentGetter object with addCallback and addErrback methods
         """
         logger.info("url: %s", url)
-        return ContentGetter(self, url, params)
+        return ContentGetter(self, url, params, headers, max_size)
+
+    def getHeadersAsync(self, url):
+        """
+        Asynchronous HEAD request, e.g. to learn the size of a file without downloading it
+        Returns a HeadRequester object with addCallback and addErrback methods, the callback gets the response headers
+        """
+        logger.info("url: %s", url)
+        return HeadRequester(self, url)
 
     def postContentAsync(self, url, data=None):
         """
@@ -45,17 +224,25 @@ class WebRequestsAsync(WebRequests):
 class BaseRequestHandler:
     """Base class for async request handlers"""
 
-    def __init__(self):
+    def __init__(self, client):
+        self.client = client
         self.callback = None
         self.errback = None
         self._cancelled = False
+        self._cancel_event = threading.Event()
         self._session = None
-        self._thread = None
+        self._response = None
+        self._future = None
 
     def addCallback(self, callback):
         self.callback = callback
         return self
 
+    def start(self):
+        """Start the request process on the download engine of the client"""
+        self._future = self.client.engine.submit(self.execute)
+        return self
+
     def addErrback(self, errback):
         """Add callback for request errors"""
         self.errback = errback
@@ -64,94 +251,354 @@ class BaseRequestHandler:
     def cancel(self):
         """Cancel the request process"""
         self._cancelled = True
-        if self._session:
-            self._session.close()  # Force-close the session
-        if self._thread and self._thread.is_alive():
-            # Note: We can't force-kill a thread in Python, but we set the cancelled flag
-            # and the thread will check it and exit gracefully
-            pass
+        self._cancel_event.set()  # Wake up a request waiting for a retry or the bandwidth limit
+        response = self._response
+        if response is not None:
+            # Force-close the connection to abort a blocking read, the session is shared
+            try:
+                response.close()
+            except Exception as e:
+                logger.debug("exception: %s", e)
+        # Note: We can't force-kill a running request, but we set the cancelled flag
+        # and the request will check it and exit gracefully
         return True
 
+    def throttle(self, size):
+        """Wait until the bandwidth limit of the client allows size more bytes"""
+        delay = self.client.rate_limiter.consume(size)
+        if delay:
+            self._cancel_event.wait(delay)
+
     def _callCallback(self, result):
         """Call callback in a thread-safe way"""
         if self.callback:
-            try:
-                self.callback(result)
-            except Exception as e:
-                logger.error("Error in callback: %s", e)
+            self._dispatch(self.callback, result)
 
     def _callErrback(self, error):
         """Call errback in a thread-safe way"""
         if self.errback:
-            try:
-                self.errback(error)
-            except Exception as e:
-                logger.error("Error in errback: %s", e)
+            self._dispatch(self.errback, error)
+
+    def _dispatch(self, function, arg):
+        """Hand a completion over to the completion queue of the client, or run it right away"""
+        if self.client.completion_queue is not None:
+            self.client.completion_queue.put(self._invoke, function, arg)
+        else:
+            self._invoke(function, arg)
+
+    @staticmethod
+    def _invoke(function, arg):
+        try:
+            function(arg)
+        except Exception as e:
+            logger.error("Error in %s: %s", function, e)
 
 
 class Downloader(BaseRequestHandler):
     """Helper class for asynchronous downloads with callback support"""
 
-    def __init__(self, client, url, path):
-        BaseRequestHandler.__init__(self)
-        self.client = client
+    def __init__(self, client, url, path, headers=None, resume=False, variants=None):
+        BaseRequestHandler.__init__(self, client)
         self.url = url
         self.path = path
+        self.part_path = path + ".part"
+        self.headers = headers if headers is not None else {}
+        self.resume = resume
+        self.variants = variants if variants is not None else []
         self.progback = None
         self.total_size = 0
         self.downloaded = 0
+        self.status_code = 0
+        self.response_headers = {}
+        self.not_modified = False
+        self.retries = client.retries
+        self.retry_count = 0
 
     def addProgback(self, progback):
         """Add callback for download progress updates"""
         self.progback = progback
         return self
 
-    def start(self):
-        """Start the download process"""
-        self._thread = threading.Thread(target=self.execute)
-        self._thread.daemon = True
-        self._thread.start()
-        return self
+    def getResumeHeaders(self):
+        """Return the Range headers to continue a partial download, if there is one"""
+        headers = {}
+        if self.resume and os.path.isfile(self.part_path + ".id") and os.path.isfile(self.part_path):
+            validator = readFile(self.part_path + ".id")
+            offset = os.path.getsize(self.part_path)
+            if validator and offset:
+                headers["Range"] = "bytes=%d-" % offset
+                headers["If-Range"] = validator
+                headers["Accept-Encoding"] = "identity"
+        return headers
+
+    def getResumeOffset(self, response):
+        """Return the offset a 206 response continues from, or 0 if the download starts over"""
+        if response.status_code == 206:
+            content_range = response.headers.get("content-range", "")
+            if content_range.startswith("bytes ") and "-" in content_range:
+                offset = int(content_range[6:].split("-")[0])
+                if os.path.isfile(self.part_path) and offset == os.path.getsize(self.part_path):
+                    return offset
+            logger.debug("content-range mismatch: %s", content_range)
+        return 0
+
+    def removePartialFile(self):
+        deleteFile(self.part_path)
+        deleteFile(self.part_path + ".id")
 
     def execute(self):
-        """Execute the download process"""
-        try:
-            self._cancelled = False
-            self._session = requests.Session()  # Create and store session
+        """Execute the download process, retrying transient errors with jittered exponential backoff"""
+        breaker = self.client.getCircuitBreaker(self.url)
+        while True:
+            if self._cancelled:
+                self._callErrback("cancelled")
+                return False
+            if not breaker.allow():
+                self._callErrback(CircuitOpenError(urlparse(self.url).netloc))
+                return False
+            try:
+                if not self.transfer():
+                    self._callErrback("cancelled")
+                    return False
+                breaker.recordSuccess()
+                self._callCallback(self.path)
+                return True
+            except Exception as e:
+                retryable = not self._cancelled and isRetryable(e)
+                if retryable:
+                    breaker.recordFailure()
+                if retryable and self.retry_count < self.retries:
+                    delay = self.client.backoff * (2 ** self.retry_count) * random.uniform(0.5, 1.5)
+                    self.retry_count += 1
+                    logger.info("retry: %s, delay: %.1f, url: %s, exception: %s", self.retry_count, delay, self.url, e)
+                    self._cancel_event.wait(delay)
+                    continue
+                if not self.resume:
+                    self.removePartialFile()
+                if self._cancelled:
+                    logger.debug("cancelled, url: %s", self.url)
+                    self._callErrback("cancelled")
+                    return False
+                logger.error("exception: %s", e)
+                self._callErrback(e)
+                return False
 
-            headers = {"user-agent": self.client.getUserAgent()}
-            response = self._session.get(self.url, headers=headers, stream=True, allow_redirects=True, verify=False)
-            logger.debug("response.url: %s", response.url)
-            logger.debug("response.status_code: %s", response.status_code)
-            response.raise_for_status()
+    def openResponse(self):
+        """Request the first available pre-compressed variant of the file, or the file itself"""
+        headers = {"user-agent": self.client.getUserAgent()}
+        headers.update(self.headers)
+        resume_headers = self.getResumeHeaders()
+        if not resume_headers:
+            for suffix in self.variants:
+                url = self.url + suffix
+                if url in missing_variants:
+                    continue
+                # The variant is compressed already, do not let the server compress it again
+                response = self._response = self._session.get(url, headers=dict(headers, **{"Accept-Encoding": "identity"}), stream=True, allow_redirects=True, verify=False, timeout=self.client.timeout)
+                logger.debug("url: %s, status_code: %s", url, response.status_code)
+                if response.status_code == 200:
+                    return response, decompressors[suffix]()
+                if response.status_code == 304:
+                    # The validators were stored from this variant, the local file is still current
+                    return response, None
+                response.close()
+                if response.status_code == 404:
+                    missing_variants.add(url)
+        headers.update(resume_headers)
+        response = self._response = self._session.get(self.url, headers=headers, stream=True, allow_redirects=True, verify=False, timeout=self.client.timeout)
+        logger.debug("response.url: %s", response.url)
+        logger.debug("response.status_code: %s", response.status_code)
+        if response.status_code == 416 and resume_headers:
+            # The partial file does not match the server file anymore, start over
+            response.close()
+            self.removePartialFile()
+            return self.openResponse()
+        if response.status_code == 206 and not self.getResumeOffset(response):
+            # A partial body is never taken for the whole file
+            response.close()
+            if not resume_headers:
+                raise IncompleteDownloadError("partial content without a range request: %s" % self.url)
+            # The partial content does not continue the partial file, start over without a Range request
+            self.removePartialFile()
+            return self.openResponse()
+        return response, None
+
+    def transfer(self):
+        """Transfer the file once, returns False if cancelled and raises on errors"""
+        self._session = self.client.getPooledSession(self.url)
+        response, decompressor = self.openResponse()
+        response.raise_for_status()
+        self.status_code = response.status_code
+        self.response_headers = response.headers
+
+        if response.status_code == 304:
+            # The local file is still current, leave it untouched
+            response.close()
+            self.not_modified = True
+            return True
+
+        offset = self.getResumeOffset(response)
+        logger.debug("offset: %s", offset)
+        content_length = int(response.headers.get('content-length', 0))
+        self.total_size = offset + content_length
+        self.downloaded = offset
+
+        if self.resume and not offset:
+            validator = response.headers.get("etag") or response.headers.get("last-modified")
+            if validator and not decompressor:
+                writeFile(self.part_path + ".id", validator)
+            else:
+                deleteFile(self.part_path + ".id")
+
+        with open(self.part_path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                # Check if cancelled before processing each chunk
+                if self._cancelled:
+                    logger.debug("Download cancelled during chunk processing")
+                    response.close()
+                    break
+
+                if chunk:  # filter out keep-alive chunks
+                    # Compressed variants are decompressed while streaming to disk
+                    f.write(decompressor.decompress(chunk) if decompressor else chunk)
+                    self.downloaded += len(chunk)
+                    if self.progback:
+                        progress = int(100 * self.downloaded / self.total_size) if self.total_size else 0
+                        self.progback(self.downloaded, self.total_size, progress)
+                    self.throttle(len(chunk))
+            if decompressor and hasattr(decompressor, "flush") and not self._cancelled:
+                f.write(decompressor.flush())
+
+        response.close()
+
+        if self._cancelled:
+            if not self.resume:
+                self.removePartialFile()
+            return False
+
+        # Content-Length is the encoded size if the server compressed the transfer
+        if content_length and "content-encoding" not in response.headers and self.downloaded != self.total_size:
+            raise IncompleteDownloadError("incomplete download: %s of %s bytes" % (self.downloaded, self.total_size))
+        if decompressor and not decompressor.eof:
+            raise IncompleteDownloadError("incomplete compressed stream: %s" % response.url)
+
+        os.replace(self.part_path, self.path)
+        deleteFile(self.part_path + ".id")
+        return True
+
+
+class ArchiveDownloader(BaseRequestHandler):
+    """Helper class for asynchronous archive downloads with streaming extraction"""
+
+    def __init__(self, client, urls, dest_dir, members=None):
+        BaseRequestHandler.__init__(self, client)
+        self.urls = urls
+        self.dest_dir = dest_dir
+        self.members = members
+        self.progback = None
+        self.url = None
+        self.extracted = []
+
+    def addProgback(self, progback):
+        """Add callback for extraction progress updates, called with the name of each extracted file"""
+        self.progback = progback
+        return self
 
-            self.total_size = int(response.headers.get('content-length', 0))
-            self.downloaded = 0
+    def openArchive(self):
+        """Return the response of the first archive url the server offers"""
+        headers = {"user-agent": self.client.getUserAgent()}
+        for url in self.urls:
+            response = self._session.get(url, headers=headers, stream=True, allow_redirects=True, verify=False, timeout=self.client.timeout)
+            logger.debug("url: %s, status_code: %s", url, response.status_code)
+            if response.status_code == 200:
+                self.url = url
+                return response
+            response.close()
+        return None
 
-            with open(self.path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    # Check if cancelled before processing each chunk
+    def extractMember(self, name, src):
+        """Write an archive member atomically into dest_dir"""
+        path = os.path.join(self.dest_dir, name)
+        try:
+            with open(path + ".part", "wb") as f:
+                shutil.copyfileobj(src, f, 8192)
+                size = f.tell()
+            os.replace(path + ".part", path)
+        except Exception:
+            deleteFile(path + ".part")
+            raise
+        self.extracted.append(name)
+        if self.progback:
+            self.progback(name)
+        return size
+
+    def isWanted(self, member_name):
+        name = os.path.basename(member_name)
+        if self.members is None:
+            wanted = True
+        else:
+            wanted = self.members(name) if callable(self.members) else name in self.members
+        return (name and not name.startswith(".") and wanted), name
+
+    def extractTar(self, response):
+        response.raw.decode_content = True
+        with tarfile.open(fileobj=response.raw, mode="r|*") as tar:
+            for member in tar:
+                if self._cancelled:
+                    break
+                wanted, name = self.isWanted(member.name)
+                if member.isfile() and wanted:
+                    # tar members are extracted while they are streamed, throttle by member size
+                    self.throttle(self.extractMember(name, tar.extractfile(member)))
+
+    def extractZip(self, response):
+        spool_path = os.path.join(self.dest_dir, ".archive.zip.part")
+        try:
+            with open(spool_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if self._cancelled:
+                        return
+                    f.write(chunk)
+                    self.throttle(len(chunk))
+            with zipfile.ZipFile(spool_path) as archive:
+                for info in archive.infolist():
                     if self._cancelled:
-                        logger.debug("Download cancelled during chunk processing")
-                        response.close()
                         break
+                    wanted, name = self.isWanted(info.filename)
+                    if not info.is_dir() and wanted:
+                        with archive.open(info) as src:
+                            self.extractMember(name, src)
+        finally:
+            deleteFile(spool_path)
 
-                    if chunk:  # filter out keep-alive chunks
-                        f.write(chunk)
-                        self.downloaded += len(chunk)
-                        if self.progback and self.total_size:
-                            progress = int(100 * self.downloaded / self.total_size)
-                            self.progback(self.downloaded, self.total_size, progress)
-
+    def execute(self):
+        """Execute the archive download process"""
+        try:
+            if self._cancelled:
+                self._callErrback("cancelled")
+                return False
+            self._session = self.client.getPooledSession(self.urls[0])
+            response = self._response = self.openArchive()
+            if response is None:
+                self._callErrback("no archive available")
+                return False
+            if self.url.endswith(".zip"):
+                self.extractZip(response)
+            else:
+                self.extractTar(response)
             response.close()
+            logger.debug("url: %s, extracted: %s", self.url, len(self.extracted))
 
             if self._cancelled:
                 self._callErrback("cancelled")
                 return False
 
-            self._callCallback(self.path)
+            self._callCallback(self.extracted)
             return True
         except Exception as e:
+            if self._cancelled:
+                self._callErrback("cancelled")
+                return False
             logger.error("exception: %s", e)
             self._callErrback(e)
             return False
@@ -160,29 +607,25 @@ class Downloader(BaseRequestHandler):
 class ContentGetter(BaseRequestHandler):
     """Helper class for asynchronous GET requests with callback support"""
 
-    def __init__(self, web_requests, url, params=None):
-        BaseRequestHandler.__init__(self)
-        self.web_requests = web_requests
+    def __init__(self, client, url, params=None, headers=None, max_size=0):
+        BaseRequestHandler.__init__(self, client)
         self.url = url
         self.params = params if params is not None else {}
-
-    def start(self):
-        """Start the GET request process"""
-        self._thread = threading.Thread(target=self.execute)
-        self._thread.daemon = True
-        self._thread.start()
-        return self
+        self.headers = headers or {}
+        self.max_size = max_size
+        self.latency = 0
+        self.elapsed = 0
 
     def execute(self):
         """Execute the GET request process"""
+        start_time = time.time()
         try:
-            self._cancelled = False
-            self._session = requests.Session()  # Create and store session
+            self._session = self.client.getPooledSession(self.url)
 
-            headers = {"user-agent": self.web_requests.getUserAgent()}
-            response = self._session.get(
+            headers = dict(self.headers, **{"user-agent": self.client.getUserAgent()})
+            response = self._response = self._session.get(
                 self.url, headers=headers, params=self.params,
-                allow_redirects=True, verify=False, stream=True
+                allow_redirects=True, verify=False, stream=True, timeout=self.client.timeout
             )
             logger.debug("response.url: %s", response.url)
             logger.debug("response.status_code: %s", response.status_code)
@@ -194,8 +637,15 @@ class ContentGetter(BaseRequestHandler):
                 return None
 
             # Read the content
-            content = response.content
-            response.raise_for_status()
+            if self.max_size:
+                response.raise_for_status()
+                content = self.readContent(response)
+            else:
+                content = response.content
+                response.raise_for_status()
+            # time to the response headers and time of the whole request, e.g. for mirror probing
+            self.latency = response.elapsed.total_seconds()
+            self.elapsed = time.time() - start_time
 
             # Check if cancelled before calling callback
             if self._cancelled:
@@ -204,6 +654,54 @@ class ContentGetter(BaseRequestHandler):
 
             self._callCallback(content)
             return content
+        except Exception as e:
+            if isNotFound(e):
+                # A missing optional file is up to the errback, e.g. a set without picon hash list
+                logger.info("not found: %s", self.url)
+            else:
+                logger.error("exception: %s", e)
+            if not self._cancelled:
+                self._callErrback(e)
+            return None
+
+    def readContent(self, response):
+        """Read up to max_size bytes of the content and drop the rest of the response"""
+        content = b""
+        for chunk in response.iter_content(chunk_size=8192):
+            content += chunk
+            if len(content) >= self.max_size:
+                break
+        response.close()
+        return content[:self.max_size]
+
+
+class HeadRequester(BaseRequestHandler):
+    """Helper class for asynchronous HEAD requests with callback support"""
+
+    def __init__(self, client, url):
+        BaseRequestHandler.__init__(self, client)
+        self.url = url
+
+    def execute(self):
+        """Execute the HEAD request process"""
+        try:
+            self._session = self.client.getPooledSession(self.url)
+
+            # identity, so content-length is the size of the file and not of a compressed response
+            headers = {"user-agent": self.client.getUserAgent(), "Accept-Encoding": "identity"}
+            response = self._response = self._session.head(
+                self.url, headers=headers, allow_redirects=True, verify=False, timeout=self.client.timeout
+            )
+            logger.debug("response.url: %s", response.url)
+            logger.debug("response.status_code: %s", response.status_code)
+            response.raise_for_status()
+
+            if self._cancelled:
+                self._callErrback("cancelled")
+                return None
+
+            self._callCallback(response.headers)
+            return response.headers
         except Exception as e:
             logger.error("exception: %s", e)
             if not self._cancelled:
@@ -214,33 +712,24 @@ class ContentGetter(BaseRequestHandler):
 class ContentPoster(BaseRequestHandler):
     """Helper class for asynchronous POST requests with callback support"""
 
-    def __init__(self, web_requests, url, data=None):
-        BaseRequestHandler.__init__(self)
-        self.web_requests = web_requests
+    def __init__(self, client, url, data=None):
+        BaseRequestHandler.__init__(self, client)
         self.url = url
         self.data = data if data is not None else {}
 
-    def start(self):
-        """Start the POST request process"""
-        self._thread = threading.Thread(target=self.execute)
-        self._thread.daemon = True
-        self._thread.start()
-        return self
-
     def execute(self):
         """Execute the POST request process"""
         try:
-            self._cancelled = False
-            self._session = requests.Session()  # Create and store session
+            self._session = self.client.getPooledSession(self.url)
 
-            headers = {"user-agent": self.web_requests.getUserAgent(), "Content-Type": "text/plain"}
+            headers = {"user-agent": self.client.getUserAgent(), "Content-Type": "text/plain"}
 
             # Check if cancelled before making request
             if self._cancelled:
                 logger.debug("POST request cancelled before execution")
                 return None
 
-            response = self._session.post(
+            response = self._response = self._session.post(
                 self.url, headers=headers, data=json.dumps(self.data),
                 allow_redirects=True, verify=False
             )
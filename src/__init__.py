@@ -5,13 +5,22 @@
 
 import os
 import gettext
-from Tools.Directories import resolveFilename, SCOPE_PLUGINS
-from Components.Language import language
+try:
+    from Tools.Directories import resolveFilename, SCOPE_PLUGINS
+    from Components.Language import language
+except ImportError:
+    # headless, e.g. the command line sync outside of Enigma2
+    language = None
 from .Version import PLUGIN
 from .Debug import initLogging
 
 
 def initLocale():
+    if language is None:
+        locale = os.path.join(os.path.dirname(__file__), "locale")
+        if os.path.exists(locale):
+            gettext.bindtextdomain(PLUGIN, locale)
+        return
     os.environ["LANGUAGE"] = language.getLanguage()[:2]
     locale = resolveFilename(SCOPE_PLUGINS, "Extensions/" + PLUGIN + "/locale")
     if not os.path.exists(locale):
@@ -26,4 +35,5 @@ def _(txt):
 
 initLogging()
 initLocale()
-language.addCallback(initLocale)
+if language is not None:
+    language.addCallback(initLocale)
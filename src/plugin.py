@@ -8,9 +8,23 @@ from .Version import VERSION
 from .Debug import logger
 from .__init__ import _
 from .PiconCockpit import PiconCockpit
+from .PiconScheduler import PiconScheduler
 from .ConfigInit import ConfigInit
 
 
+picon_scheduler = None
+
+
+def autoStart(reason, session=None, **__):
+    global picon_scheduler  # pylint: disable=global-statement
+    logger.info("reason: %s", reason)
+    if reason == 0 and session and not picon_scheduler:
+        picon_scheduler = PiconScheduler(session)
+    elif reason == 1 and picon_scheduler:
+        picon_scheduler.stop()
+        picon_scheduler = None
+
+
 def startPiconCockpit(session, **__):
     logger.info("...")
     session.open(PiconCockpit)
@@ -19,9 +33,15 @@ def startPiconCockpit(session, **__):
 def Plugins(**__):
     logger.info("  +++ Version: %s starts...", VERSION)
     ConfigInit()
-    return PluginDescriptor(
-        name=_("PiconCockpit"),
-        description=_("Manage Picons"),
-        where=PluginDescriptor.WHERE_PLUGINMENU,
-        icon="PiconCockpit.png", fnc=startPiconCockpit
-    )
+    return [
+        PluginDescriptor(
+            name=_("PiconCockpit"),
+            description=_("Manage Picons"),
+            where=PluginDescriptor.WHERE_PLUGINMENU,
+            icon="PiconCockpit.png", fnc=startPiconCockpit
+        ),
+        PluginDescriptor(
+            where=[PluginDescriptor.WHERE_SESSIONSTART, PluginDescriptor.WHERE_AUTOSTART],
+            fnc=autoStart
+        ),
+    ]
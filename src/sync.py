@@ -0,0 +1,336 @@
+# coding=utf-8
+# Copyright (C) 2018-2026 by xcentaurix
+# License: GNU General Public License v3.0 (see LICENSE file for details)
+
+
+"""
+Headless picon sync, e.g. from cron, run from the Plugins/Extensions directory:
+python -m PiconCockpit.sync --set <signature> --dir /usr/share/enigma2/picon --mode bouquets|all
+Progress is reported on stdout, errors on stderr
+"""
+
+
+import os
+import sys
+import time
+import queue
+import signal
+import argparse
+from urllib.parse import urljoin
+
+from .Debug import logger, log_levels, setLogLevel
+from .WebRequestsAsync import WebRequestsAsync
+from .FileUtils import iterFileLines, createDirectory
+from .PiconCatalog import default_server, picon_info_file, picon_list_file, compressed_variants, getCatalogUrl, parseCatalog, findPiconSet
+from .BouquetScan import bouquet_dir, listBouquetServices, getBouquetPicons
+from .PiconSync import getChangedFilter, PiconList
+from .PiconMetadata import PiconMetadata
+from .PiconManifest import manifest_file, loadManifest, getManifestFilter, deleteRemovedPicons
+from .PiconMirrors import MirrorSet, parseMirrorList
+from .PiconPreflight import PiconPreflight
+from .PiconDownload import PiconDownload, DownloadOptions
+from .PiconSpool import spool_root
+from .DownloadStats import formatBytes
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_SERVER = 3
+EXIT_SPACE = 4
+EXIT_CANCELLED = 130
+
+
+class CompletionLoop():
+    """
+    Completion queue of the command line, the main thread blocks on it and runs the callbacks
+    A SIGINT or SIGTERM is turned into a cancel of the running operation
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.interrupted = False
+
+    def put(self, function, *args):
+        self.queue.put((function, args))
+
+    def interrupt(self, *_args):
+        self.interrupted = True
+
+    def run(self, until, on_interrupt=None):
+        """
+        Run callbacks until until() is true, the first interrupt calls on_interrupt and the run goes on until the
+        operation has wound down, a second interrupt or an interrupt without on_interrupt raises KeyboardInterrupt
+        """
+        while not until():
+            if self.interrupted:
+                self.interrupted = False
+                if on_interrupt is None:
+                    raise KeyboardInterrupt()
+                on_interrupt()
+                on_interrupt = None
+            try:
+                function, args = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error("function: %s, exception: %s", function, e)
+
+    def close(self):
+        logger.debug("pending: %s", self.queue.qsize())
+
+
+def printMessage(message, error=False):
+    """Output of the command line, errors go to stderr"""
+    print(message, file=sys.stderr if error else sys.stdout, flush=True)
+
+
+def logMessage(message, error=False):
+    """Output of a sync that runs inside Enigma2, e.g. a scheduled one"""
+    if error:
+        logger.error(message)
+    else:
+        logger.info(message)
+
+
+class ProgressReporter():
+    """Reports the progress of a picon download to output, at most once per interval seconds"""
+
+    def __init__(self, download, interval=1.0, quiet=False, output=printMessage):
+        self.download = download
+        self.interval = interval
+        self.quiet = quiet
+        self.output = output
+        self.last_time = 0
+        self.done = False
+
+    def progress(self):
+        now = time.monotonic()
+        if not self.quiet and now - self.last_time >= self.interval:
+            self.last_time = now
+            download = self.download
+            current_files = min(download.current_files + download.active_file_ops, download.total_files)
+            self.output("%d/%d %s%s" % (current_files, download.total_files, download.status, download.progressInfo()))
+
+    def finished(self):
+        self.done = True
+        self.output(self.download.status)
+
+
+def fetchFile(web_client, loop, url, path, headers=None):
+    """Download url to path and wait for it, returns the downloader and the error, or None"""
+    result = {}
+    downloader = web_client.downloadFileAsync(url, path, headers, variants=compressed_variants)
+    downloader.addCallback(lambda _result: result.setdefault("error", None))
+    downloader.addErrback(lambda error: result.setdefault("error", error))
+    downloader.start()
+    loop.run(lambda: "error" in result)
+    return downloader, result["error"]
+
+
+def getSetUrl(picon_set):
+    picon_set_url = picon_set["dir_url"]
+    return picon_set_url if picon_set_url.endswith("/") else picon_set_url + "/"
+
+
+def probeMirrors(web_client, loop, args):
+    mirrors = MirrorSet(parseMirrorList(args.server, args.mirrors))
+    if len(mirrors) > 1:
+        probed = []
+        mirrors.probe(web_client, urljoin("picons/", picon_info_file), probed.append)
+        loop.run(lambda: probed)
+    return mirrors
+
+
+def syncManifest(web_client, loop, args, picon_set, picons, output=printMessage):
+    """Filter picons by the manifest of the picon set, returns the manifest or None if the picon set has none"""
+    metadata = PiconMetadata(args.dir)
+    downloader, error = fetchFile(web_client, loop, urljoin(getSetUrl(picon_set), manifest_file), os.path.join(args.dir, manifest_file), metadata.getRequestHeaders(manifest_file))
+    manifest = None
+    if error is None:
+        if not downloader.not_modified:
+            metadata.update(manifest_file, downloader.response_headers)
+        try:
+            manifest = loadManifest(args.dir, metadata)
+        except Exception as e:
+            error = e
+    if not manifest:
+        # Without a manifest the picons are checked against the metadata of their last download
+        logger.info("falling back to changed picons, error: %s", error)
+        picons.setFilter(getChangedFilter(args.dir, metadata))
+        return None
+    if args.delete_removed:
+        removed_picons = deleteRemovedPicons(manifest, args.dir, metadata, picon_set["dir_url"])
+        if removed_picons and not args.quiet:
+            output("%d removed picons deleted" % len(removed_picons))
+    metadata.save()
+    picons.setFilter(getManifestFilter(manifest, args.dir, metadata))
+    return manifest
+
+
+def checkFreeSpace(web_client, loop, picon_set, picons, args, output=printMessage):
+    """Return False if the picons do not fit into the free space of the picon directory"""
+    estimates = []
+    PiconPreflight(web_client, picon_set["dir_url"], picons, args.dir).start(estimates.append)
+    loop.run(lambda: estimates)
+    estimate = estimates[0]
+    if not args.quiet:
+        output("%d picons, %s" % (estimate["count"], formatBytes(estimate["bytes"]) if estimate["bytes"] is not None else "size unknown"))
+    if estimate["needed"] is not None and estimate["free"] is not None and estimate["needed"] > estimate["free"]:
+        output("not enough free space in %s: %s needed, %s free" % (args.dir, formatBytes(estimate["needed"]), formatBytes(estimate["free"])), error=True)
+        return False
+    return True
+
+
+def getDownloadOptions(args):
+    bandwidth_limit = args.bandwidth_limit * 1024
+    return DownloadOptions(
+        max_downloads=args.max_downloads,
+        engine=args.engine,
+        bandwidth_limit=lambda: bandwidth_limit,
+        use_archive=args.archive,
+        dedup=args.dedup,
+        spool_size=args.spool_size * 1024 * 1024,
+        spool_directory=args.spool_dir,
+        cache_directory=args.cache_dir,
+        cache_size=args.cache_size * 1024 * 1024,
+    )
+
+
+def runDownload(loop, args, picon_set, picons, manifest, mirrors, options, output=printMessage):
+    download = PiconDownload(picon_set["dir_url"], picons, args.dir, options, loop, manifest, mirrors)
+    reporter = ProgressReporter(download, quiet=args.quiet, output=output)
+    download.progress_callback = reporter.progress
+    download.finished_callback = reporter.finished
+    try:
+        download.start()
+        loop.run(lambda: reporter.done, download.cancel)
+        if download.request_cancel:
+            # The cancelled downloads report back once they have removed their partial files, another interrupt stops waiting
+            deadline = time.monotonic() + 2
+            loop.run(lambda: not download.active_requests or time.monotonic() > deadline)
+    finally:
+        download.close()
+    if download.cancelled:
+        return EXIT_CANCELLED
+    # Picons that are not in the set are reported, but are no failure
+    return EXIT_FAILED if download.failed_files or download.skipped_files else EXIT_OK
+
+
+def sync(args, web_client, loop, options=None, output=printMessage):
+    """
+    Sync the picon set of args, options override the download options of args
+    Messages are passed to output, returns the exit code
+    """
+    createDirectory(args.dir)
+    if not os.path.isdir(args.dir):
+        output("picon directory does not exist: %s" % args.dir, error=True)
+        return EXIT_USAGE
+
+    try:
+        catalog_url = getCatalogUrl(args.server)
+    except ValueError as e:
+        output(str(e), error=True)
+        return EXIT_USAGE
+    catalog_path = os.path.join(args.dir, picon_info_file)
+    _downloader, error = fetchFile(web_client, loop, catalog_url, catalog_path)
+    if error is not None:
+        output("picon set catalog %s: %s" % (catalog_url, error), error=True)
+        return EXIT_SERVER
+    picon_sets = parseCatalog(iterFileLines(catalog_path), args.server)
+    if args.list:
+        for picon_set in sorted(picon_sets, key=lambda picon_set: picon_set["signature"]):
+            output(picon_set["signature"])
+        return EXIT_OK
+    picon_set = findPiconSet(picon_sets, args.set)
+    if picon_set is None:
+        output("picon set not found or not unique: %s" % args.set, error=True)
+        return EXIT_USAGE
+
+    bouquet_picons = getBouquetPicons(listBouquetServices(args.bouquets))
+    mirrors = probeMirrors(web_client, loop, args)
+    if args.mode == "all":
+        picon_list_path = os.path.join(args.dir, picon_list_file)
+        _downloader, error = fetchFile(web_client, loop, urljoin(getSetUrl(picon_set), picon_list_file), picon_list_path)
+        if error is not None:
+            output("picon list: %s" % error, error=True)
+            return EXIT_SERVER
+        # The bouquet picons are downloaded first
+        picons = PiconList(picon_list_path, bouquet_picons)
+    elif bouquet_picons:
+        picons = PiconList(bouquet_picons)
+    else:
+        output("no bouquet services found in %s" % args.bouquets, error=True)
+        return EXIT_USAGE
+
+    manifest = None
+    if args.sync == "manifest":
+        manifest = syncManifest(web_client, loop, args, picon_set, picons, output)
+    elif args.sync == "changed":
+        picons.setFilter(getChangedFilter(args.dir, PiconMetadata(args.dir)))
+    if not picons:
+        output("All picons are up to date.")
+        return EXIT_OK
+    if not checkFreeSpace(web_client, loop, picon_set, picons, args, output):
+        return EXIT_SPACE
+    return runDownload(loop, args, picon_set, picons, manifest, mirrors, options or getDownloadOptions(args), output)
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m PiconCockpit.sync",
+        description="Download a picon set into a picon directory without the Enigma2 GUI",
+        epilog="exit codes: 0 ok, 1 some picons failed, 2 usage or picon set error, 3 server error, 4 not enough free space, 130 cancelled",
+    )
+    parser.add_argument("--set", help="signature of the picon set, or a part of it that matches only one set")
+    parser.add_argument("--list", action="store_true", help="list the signatures of the picon sets and exit")
+    parser.add_argument("--dir", default="/usr/share/enigma2/picon", help="picon directory (default: %(default)s)")
+    parser.add_argument("--mode", choices=["bouquets", "all"], default="bouquets", help="picons of the user bouquets or all picons of the set (default: %(default)s)")
+    parser.add_argument("--sync", choices=["full", "changed", "manifest"], default="changed", help="which picons are downloaded (default: %(default)s)")
+    parser.add_argument("--delete-removed", action="store_true", help="delete picons that were removed from the set manifest")
+    parser.add_argument("--server", default=default_server, help="picon server (default: %(default)s)")
+    parser.add_argument("--mirrors", default="", help="comma separated mirrors of the picon server")
+    parser.add_argument("--bouquets", default=bouquet_dir, help="directory of the bouquet files (default: %(default)s)")
+    parser.add_argument("--max-downloads", type=int, default=4, help="parallel downloads (default: %(default)s)")
+    parser.add_argument("--engine", choices=["threads", "pool"], default="threads", help="download engine (default: %(default)s)")
+    parser.add_argument("--bandwidth-limit", type=int, default=0, help="KB/s, 0 for unlimited")
+    parser.add_argument("--archive", action="store_true", help="download the picon archive of the set if there is one")
+    parser.add_argument("--dedup", action="store_true", help="link identical picons")
+    parser.add_argument("--spool-size", type=int, default=0, help="MB of RAM to spool downloads in, 0 writes directly")
+    parser.add_argument("--spool-dir", default=spool_root, help="RAM file system directory of the spool (default: %(default)s)")
+    parser.add_argument("--cache-dir", default="/usr/share/enigma2/piconcockpit_cache", help="picon cache directory (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=0, help="MB of picon cache, 0 disables the cache")
+    parser.add_argument("--quiet", action="store_true", help="only print the result")
+    parser.add_argument("--log-level", choices=list(log_levels.keys()), default="ERROR", help="(default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not args.set and not args.list:
+        parser.error("--set or --list is required")
+    if args.max_downloads < 1:
+        parser.error("--max-downloads must be at least 1")
+    return args
+
+
+def main(argv=None):
+    try:
+        args = parseArguments(argv)
+    except SystemExit as e:
+        return EXIT_USAGE if e.code else EXIT_OK
+    setLogLevel(log_levels[args.log_level])
+    loop = CompletionLoop()
+    signal.signal(signal.SIGINT, loop.interrupt)
+    signal.signal(signal.SIGTERM, loop.interrupt)
+    web_client = WebRequestsAsync(engine=args.engine, completion_queue=loop)
+    try:
+        return sync(args, web_client, loop)
+    except KeyboardInterrupt:
+        printMessage("Cancelled.", error=True)
+        return EXIT_CANCELLED
+    finally:
+        web_client.close()
+        loop.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())